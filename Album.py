@@ -1,10 +1,21 @@
 import json
 import os
+from array import array
+from Storage import atomic_write_json
+from MutationLog import MutationLog
+from SQLiteStore import get_store
+
+# Rewrite albums.json and clear the album log after this many log records
+COMPACT_THRESHOLD = 1000
 
 class Album:
-    def __init__(self, name):
+    def __init__(self, name, track_table=None):
         self.__name = name
         self.__tracks = []  # List of tracks in this album
+        self.__track_set = set()  # Hash set of same tracks for duplicate checking
+        self.__track_table = track_table  # Library's TrackTable, or None
+        self.__rows = array('I')  # Track table rows of library tracks
+        self.__other_seconds = 0  # Seconds of tracks without a table row
     
     # Getters
     def get_name(self):
@@ -16,21 +27,34 @@ class Album:
     def get_track_count(self):
         return len(self.__tracks)
     
+    # Check if track is in album (hash lookup)
+    def has_track(self, track):
+        return track in self.__track_set
+    
     # Add track to album
     def add_track(self, track):
         # Check if track already exists in album
-        for t in self.__tracks:
-            if t == track:
-                return False
+        if track in self.__track_set:
+            return False
         
         self.__tracks.append(track)
+        self.__track_set.add(track)
+        row = self.__track_table.row_for(track) if self.__track_table else None
+        if row is None:
+            self.__other_seconds += track.duration_to_seconds()
+        else:
+            self.__rows.append(row)
         return True
     
+    # Get total seconds of album (summed over track table column)
+    def get_total_seconds(self):
+        if self.__track_table is None:
+            return self.__other_seconds
+        return self.__track_table.total_seconds(self.__rows) + self.__other_seconds
+    
     # Calculate total duration of album
     def get_total_duration(self):
-        total_seconds = 0
-        for track in self.__tracks:
-            total_seconds += track.duration_to_seconds()
+        total_seconds = self.get_total_seconds()
         
         hours = total_seconds // 3600
         minutes = (total_seconds % 3600) // 60
@@ -52,49 +76,103 @@ class Album:
             print(f"    [{i}] {track.display()}")
         print()
     
-    # Convert to dictionary for saving
+    # Convert to dictionary for saving (tracks saved as library track ids)
     def to_dict(self):
         return {
             "name": self.__name,
-            "tracks": [track.to_dict() for track in self.__tracks]
+            "tracks": [track.to_ref() for track in self.__tracks]
         }
     
     # Create album from dictionary
+    # resolve(ref) gets the library track for a saved track id (or a full
+    # track dict in older files), or None if track is not in library
     @staticmethod
-    def from_dict(data, track_objects):
-        album = Album(data["name"])
-        # Match tracks by comparing with track objects
-        for track_data in data["tracks"]:
-            for track in track_objects:
-                if (track.get_title() == track_data["title"] and
-                    str(track.get_artist()) == str(track_data["artist"]) and
-                    track.get_album() == track_data["album"]):
-                    album.add_track(track)
-                    break
+    def from_dict(data, resolve, track_table=None):
+        album = Album(data["name"], track_table)
+        for ref in data["tracks"]:
+            track = resolve(ref)
+            if track:
+                album.add_track(track)
         return album
 
 
 # Album Manager to handle all albums
 class AlbumManager:
-    def __init__(self):
+    """
+    Manage albums (album name -> Album) and save them.
+    
+    Saving is incremental: the manager remembers which albums got tracks
+    since the last save, and save() appends one log record per changed
+    album with only its new track ids. Adding to one album costs the size
+    of that change, not of the whole collection. albums.json is rewritten
+    from memory (and the log cleared) every COMPACT_THRESHOLD records.
+    Loading reads albums.json, then replays the log on top.
+    With the sqlite backend each added track is one row insert instead.
+    
+    Attributes:
+        __albums: Album name -> Album, in creation order
+        __track_table: Library's TrackTable for album totals, or None
+        __file_path: Path of albums JSON snapshot
+        __log: Log of album changes since the snapshot
+        __dirty: Changed album name -> index of its first unsaved track
+        __store: SQLiteStore when sqlite backend is configured, else None
+    """
+    def __init__(self, track_table=None):
         self.__albums = {}  # Hash map: album name -> Album object
+        self.__track_table = track_table  # Column store for album totals
         self.__file_path = "data/albums.json"
+        self.__log = MutationLog("data/albums.log")
+        self.__dirty = {}  # Albums with unsaved tracks
+        self.__store = get_store()  # SQLite store, or None for JSON file
     
     # Get or create album
     def get_or_create_album(self, album_name):
         if album_name not in self.__albums:
             # Create new album
-            album = Album(album_name)
+            album = Album(album_name, self.__track_table)
             self.__albums[album_name] = album
             return album
         return self.__albums[album_name]
     
     # Add track to appropriate album
-    def add_track_to_album(self, track):
+    # save=False leaves the change for the next save() (bulk imports and
+    # Library, whose own log already has the track)
+    def add_track_to_album(self, track, save=True):
         album_name = track.get_album()
         album = self.get_or_create_album(album_name)
-        album.add_track(track)
+        added = album.add_track(track)
+        if self.__store:
+            if added:
+                self.__store.add_album_track(album_name, track)  # One row
+            return
+        if added:
+            # Remember where the unsaved tracks of this album start
+            self.__dirty.setdefault(album_name, album.get_track_count() - 1)
+        if save:
+            self.save()
+    
+    # Save changed albums: one log record per album with its new tracks
+    def save(self):
+        if self.__store or not self.__dirty:
+            return
+        for name, start in self.__dirty.items():
+            tracks = self.__albums[name].get_tracks()[start:]
+            self.__log.append({"op": "add", "album": name,
+                               "tracks": [track.to_ref() for track in tracks]})
+        self.__dirty = {}
+        self.__log.sync()
+        if self.__log.get_count() >= COMPACT_THRESHOLD:
+            self.compact()
+    
+    # Write all albums to albums.json and clear the log
+    def compact(self):
+        self.__log.begin_compaction()
         self.__save_to_file()
+        self.__log.finish_compaction()
+    
+    # Make sure saved changes are on disk (call before exit)
+    def close(self):
+        self.__log.close()
     
     # Get album by name
     def get_album(self, name):
@@ -141,25 +219,44 @@ class AlbumManager:
     
     # Save albums to file
     def __save_to_file(self):
-        data = []
-        for album in self.__albums.values():
-            data.append(album.to_dict())
-        
-        os.makedirs(os.path.dirname(self.__file_path), exist_ok=True)
-        
-        with open(self.__file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        data = [album.to_dict() for album in self.__albums.values()]
+        atomic_write_json(self.__file_path, data)
     
-    # Load albums from file
-    def load_from_file(self, track_objects):
-        if not os.path.exists(self.__file_path):
-            return
-        
+    # Load albums from file, then replay album log on top
+    # resolve(ref) gives library track for saved ref
+    def load_from_file(self, resolve):
         try:
-            with open(self.__file_path, 'r') as f:
-                data = json.load(f)
-                for album_data in data:
-                    album = Album.from_dict(album_data, track_objects)
-                    self.__albums[album.get_name()] = album
+            if os.path.exists(self.__file_path):
+                with open(self.__file_path, 'r') as f:
+                    data = json.load(f)
+                    for album_data in data:
+                        album = Album.from_dict(album_data, resolve, self.__track_table)
+                        self.__albums[album.get_name()] = album
+            
+            # Changes saved after the snapshot (replay is idempotent, tracks
+            # already in the album are skipped)
+            for record in self.__log.replay():
+                if record.get("op") == "add":
+                    album = self.get_or_create_album(record["album"])
+                    for ref in record["tracks"]:
+                        track = resolve(ref)
+                        if track:
+                            album.add_track(track)
         except:
-            print("Error loading albums file")
\ No newline at end of file
+            print("Error loading albums file")
+    
+    # Load albums from SQLite store, resolve(track_id) gives library track
+    def load_from_store(self, resolve):
+        for name, track_ids in self.__store.load_albums():
+            album = self.get_or_create_album(name)
+            for track_id in track_ids:
+                track = resolve(track_id)
+                if track:
+                    album.add_track(track)
+    
+    # Write all albums into SQLite store (first run with sqlite backend)
+    def save_to_store(self):
+        with self.__store.transaction():
+            for album in self.__albums.values():
+                for track in album.get_tracks():
+                    self.__store.add_album_track(album.get_name(), track)
@@ -0,0 +1,88 @@
+import sys
+from SearchIndex import normalize_text
+
+
+class ArtistRegistry:
+    """
+    Registry of every credited artist with per-artist track and album indexes.
+
+    Each distinct artist gets an integer id the first time it is
+    credited. Names are matched after normalize_text (case folded,
+    whitespace collapsed), so "  The  Beatles" and "the beatles" are the
+    same artist. Every artist of a multi-artist track is
+    credited, so a track shows up under each of its artists. The indexes
+    are updated one track at a time as tracks are added, so listing an
+    artist's tracks or albums only touches that artist's entries.
+
+    Attributes:
+        __ids: Normalized name -> artist id
+        __names: Display name by artist id (first spelling seen)
+        __tracks: Tracks by artist id, in the order they were added
+        __albums: Album names by artist id (dict used as ordered set)
+    """
+    def __init__(self):
+        self.__ids = {}
+        self.__names = []
+        self.__tracks = []
+        self.__albums = []
+
+    # Number of artists
+    def __len__(self):
+        return len(self.__names)
+
+    # Get id of artist, registering it if new
+    def intern(self, name):
+        key = normalize_text(name)
+        artist_id = self.__ids.get(key)
+        if artist_id is None:
+            artist_id = self.__ids[key] = len(self.__names)
+            self.__names.append(sys.intern(" ".join(name.split())))
+            self.__tracks.append([])
+            self.__albums.append({})
+        return artist_id
+
+    # Get id of artist, or None if artist is not credited on any track
+    def get_id(self, name):
+        return self.__ids.get(normalize_text(name))
+
+    # Get ids of track's artists (each artist once, in credit order)
+    def get_track_artist_ids(self, track):
+        return tuple(dict.fromkeys(self.intern(name) for name in track.get_artists()))
+
+    # Index track under each of its artists
+    def add_track(self, track):
+        album = track.get_album()
+        for artist_id in self.get_track_artist_ids(track):
+            self.__tracks[artist_id].append(track)
+            self.__albums[artist_id][album] = None
+
+    # Get display name of artist id
+    def get_name(self, artist_id):
+        return self.__names[artist_id]
+
+    # Get display names of all artists (registration order)
+    def get_artist_names(self):
+        return list(self.__names)
+
+    # Get tracks credited to artist in library order, [] if unknown
+    def get_tracks(self, name):
+        artist_id = self.get_id(name)
+        if artist_id is None:
+            return []
+        return sorted(self.__tracks[artist_id], key=lambda track: track.get_sort_key())
+
+    # Get names of albums with tracks by artist (first seen first)
+    def get_albums(self, name):
+        artist_id = self.get_id(name)
+        if artist_id is None:
+            return []
+        return list(self.__albums[artist_id])
+
+    # Get (track count, album count, total seconds) of artist
+    def get_stats(self, name):
+        artist_id = self.get_id(name)
+        if artist_id is None:
+            return 0, 0, 0
+        tracks = self.__tracks[artist_id]
+        return (len(tracks), len(self.__albums[artist_id]),
+                sum(track.duration_to_seconds() for track in tracks))
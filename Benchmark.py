@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Scale benchmark for Library, AlbumManager, PlaylistManager and MusicQueue
+#
+#   python Benchmark.py --sizes 1000 10000 100000 --output bench.json
+#
+# Every catalog size runs in its own process inside an empty temporary
+# directory (the managers use relative data/ paths), so runs never touch
+# the real data and each size starts with a cold cache and its own memory
+# peak. Results are written as JSON so two runs can be compared.
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_SEED = 42
+
+# Operations whose cost grows with their own input size are capped so
+# big catalogs still finish (the cap is saved with the results)
+QUEUE_SIZE = 2000  # Tracks enqueued
+PLAYLIST_SIZE = 2000  # Tracks in the sorted playlist
+PERSISTED_ADDS = 200  # Single adds that each save (library log, playlist file)
+QUERIES = 200  # Lookups per search/paging benchmark
+
+WORDS = ["love", "night", "summer", "heart", "fire", "dream", "city", "light",
+         "rain", "golden", "wild", "blue", "river", "echo", "midnight", "dance",
+         "ghost", "paper", "ocean", "silver", "broken", "young", "forever", "stars",
+         "home", "road", "shadow", "electric", "velvet", "morning", "storm", "sugar"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "ne", "to", "sa", "vi", "du", "el", "an",
+             "or", "li", "be", "zu", "ta", "mo", "ri", "ja", "ne"]
+
+
+# Make a name like "Kalomi Rane" from syllables
+def make_name(rng, parts):
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        for _ in range(parts))
+
+
+# Generate `count` synthetic tracks as dicts (same seed = same catalog)
+# Artists follow a Zipf-like popularity (a few artists have many albums),
+# albums have 6-16 tracks, about 15% of tracks feature extra artists and
+# durations cluster around 3-4 minutes.
+def generate_catalog(count, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    artist_count = max(20, count // 40)
+    artists = [make_name(rng, rng.choice((1, 2))) for _ in range(artist_count)]
+    weights = [1 / (rank + 1) for rank in range(artist_count)]
+
+    tracks = []
+    album_number = 0
+    while len(tracks) < count:
+        artist = rng.choices(artists, weights)[0]
+        album_number += 1
+        album = f"{' '.join(rng.sample(WORDS, rng.randint(1, 3))).title()} {album_number}"
+        for track_number in range(rng.randint(6, 16)):
+            if len(tracks) == count:
+                break
+            title = " ".join(rng.sample(WORDS, rng.randint(1, 4))).title()
+            title = f"{title} {album_number}-{track_number}"
+            track_artist = artist
+            if rng.random() < 0.15:
+                track_artist = [artist] + rng.sample(artists, rng.randint(1, 2))
+            seconds = max(30, int(rng.lognormvariate(5.3, 0.3)))
+            tracks.append({
+                "title": title,
+                "artist": track_artist,
+                "album": album,
+                "duration": f"{seconds // 60}:{seconds % 60:02d}"
+            })
+    return tracks
+
+
+# Time fn() and store seconds under name, return fn's result
+def timed(timings, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = round(time.perf_counter() - start, 6)
+    return result
+
+
+# Run every benchmark for one catalog size (current directory is empty)
+def run_size(count, seed):
+    from Library import Library
+    from Playlist import PlaylistManager
+    from Queue import MusicQueue
+    from Track import Track
+    import Config
+
+    rng = random.Random(seed + 1)
+    timings = {}
+    libraries = []  # Every Library opened below
+
+    # Time one step once background work of the open libraries (fuzzy
+    # index linking, compaction) is done, so it never shares the CPU with
+    # those threads and runs stay comparable
+    def step(name, fn):
+        for open_library in libraries:
+            open_library.wait_idle()
+        return timed(timings, name, fn)
+
+    records = step("generate", lambda: generate_catalog(count, seed))
+
+    os.makedirs("import/tracks")
+    with open("import/tracks/catalog.json", "w") as f:
+        json.dump(records, f)
+
+    # Library: bulk import (parse + insert + snapshot), then reload
+    library = Library()
+    libraries.append(library)
+    result = step("library_import_json",
+                  lambda: library.import_from_json("import/tracks/catalog.json"))
+    extra = [Track(f"Single Add {i}", "Bench Artist", "Bench Album", "3:00")
+             for i in range(PERSISTED_ADDS)]
+    step("library_add_single_logged",
+         lambda: [library.add_track(track) for track in extra])
+    step("library_compact", library.compact)
+    library.close()
+
+    library = step("library_load_json", Library)
+    libraries.append(library)
+    tracks = library.get_all_tracks()
+    step("album_grouping_load", library.get_album_manager)
+
+    # Searches and positional access
+    terms = [rng.choice(WORDS) for _ in range(QUERIES)]
+    step("search_title_substring",
+         lambda: [library.search_by_title(term) for term in terms])
+    step("search_field_query",
+         lambda: [library.search(f"title:{term} {rng.choice(WORDS)}") for term in terms])
+    step("search_prefix",
+         lambda: [library.search_by_prefix(term[:3]) for term in terms])
+    typos = [term[:-1] + "x" for term in terms[:QUERIES // 10]]
+    step("search_fuzzy", lambda: [library.fuzzy_search(term, 5) for term in typos])
+    pages = max(1, count // 10)
+    step("library_paging",
+         lambda: [library.get_page(rng.randint(1, pages)) for _ in range(QUERIES)])
+    picks = [rng.choice(tracks) for _ in range(QUERIES)]
+    step("library_rank_of", lambda: [library.rank_of(track) for track in picks])
+
+    # Binary snapshot startup (written by compaction, read lazily)
+    Config.SNAPSHOT_FORMAT = "binary"
+    step("binary_snapshot_write", lambda: Library().close())
+    library_bin = step("library_load_binary", Library)
+    libraries.append(library_bin)
+    step("binary_first_page", lambda: library_bin.get_page(1))
+    library_bin.close()
+    Config.SNAPSHOT_FORMAT = "json"
+
+    # Playlists: persisted adds, sort, sort playlists
+    playlists = step("playlists_load", lambda: PlaylistManager(library))
+    playlists.create_playlist("Bench")
+    step("playlist_add_persisted",
+         lambda: [playlists.add_track_to_playlist("Bench", track)
+                  for track in tracks[:PERSISTED_ADDS]])
+    big = playlists.get_playlist("Bench")
+    for track in rng.sample(tracks, min(PLAYLIST_SIZE, len(tracks))):
+        big.add_track(track)
+    for criteria in ("title", "artist", "duration", "date_added"):
+        step(f"playlist_sort_{criteria}", lambda: big.sort_tracks(criteria))
+    for i in range(50):
+        playlists.create_playlist(f"Bench {i}")
+    step("playlists_sort_duration", lambda: playlists.sort_playlists("duration"))
+
+    # Queue: enqueue, shuffle/unshuffle, remove, persistence
+    queue = MusicQueue(library)
+    queued = rng.sample(tracks, min(QUEUE_SIZE, len(tracks)))
+    step("queue_enqueue", lambda: queue.load_tracks(queued))
+    step("queue_shuffle", queue.shuffle)
+    step("queue_unshuffle", queue.unshuffle)
+    removals = [rng.randint(1, queue.get_size() - i) for i in range(min(100, len(queued)))]
+    step("queue_remove", lambda: [queue.remove_track(index) for index in removals])
+    step("queue_save", queue.flush_state)
+    step("queue_load", lambda: MusicQueue(library).load_state())
+    library.close()
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "size": count,
+        "imported": result.get("imported"),
+        "timings": timings,
+        "peak_memory_kb": usage.ru_maxrss
+    }
+
+
+# Run one size in a fresh process and temporary directory
+def run_isolated(count, seed):
+    workspace = tempfile.mkdtemp(prefix="lttm-bench-")
+    try:
+        command = [sys.executable, os.path.abspath(__file__), "--run-one", str(count),
+                   "--seed", str(seed)]
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(command, cwd=workspace, env=env, check=True,
+                                stdout=subprocess.PIPE, text=True).stdout
+        return json.loads(output.splitlines()[-1])  # Last line is the result
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark library operations at scale")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="catalog sizes to run (e.g. 1000 100000 1000000)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        # Child process: print result as the last line of stdout
+        print(json.dumps(run_size(args.run_one, args.seed)))
+        return
+
+    results = []
+    for count in args.sizes:
+        print(f"Running {count} tracks...", flush=True)
+        result = run_isolated(count, args.seed)
+        for name, seconds in result["timings"].items():
+            print(f"  {name:<28} {seconds:10.4f} s")
+        results.append(result)
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": os.environ.get("LTTM_STORAGE", "json"),
+        "caps": {"queue_size": QUEUE_SIZE, "playlist_size": PLAYLIST_SIZE,
+                 "persisted_adds": PERSISTED_ADDS, "queries": QUERIES},
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import mmap
+import struct
+from bisect import bisect_left
+from heapq import merge
+from Track import Track
+from Storage import atomic_write_bytes
+
+# File layout (all integers little-endian):
+#   header   magic, format version, track count, string count and the
+#            offsets of the string table, track records and id index
+#   records  one fixed-width record per track, in library sort order
+#   id index (track id, record position) per track, sorted by track id
+#   strings  (offset, length) entry per string, then all UTF-8 bytes
+MAGIC = b"LTTMSNAP"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sHHIIQQQ")
+# track id, title, artist, album, duration string ids, seconds, flags (+ padding)
+RECORD = struct.Struct("<IIIIIIB3x")
+ID_ENTRY = struct.Struct("<II")
+STRING_ENTRY = struct.Struct("<II")
+
+# Record flag: artist string hold several artists joined by ARTIST_SEPARATOR
+FLAG_ARTIST_LIST = 1
+ARTIST_SEPARATOR = "\x1f"
+
+
+# Write tracks (already in library sort order, all with a track id) as
+# binary snapshot. Every distinct string is stored once, records only
+# keep its id
+def write_snapshot(file_path, tracks):
+    string_ids = {}
+    strings = []
+
+    # Intern string, return its id in the string table
+    def intern(text):
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(strings)
+            strings.append(text.encode("utf-8"))
+        return string_id
+
+    records = bytearray(RECORD.size * len(tracks))
+    for i, track in enumerate(tracks):
+        artist = track.get_artist()
+        flags = 0
+        if isinstance(artist, list):
+            artist = ARTIST_SEPARATOR.join(artist)
+            flags |= FLAG_ARTIST_LIST
+        RECORD.pack_into(records, i * RECORD.size, track.get_id(),
+                         intern(track.get_title()), intern(artist),
+                         intern(track.get_album()), intern(track.get_duration()),
+                         track.get_sort_key()[3], flags)
+
+    positions = sorted(range(len(tracks)), key=lambda i: tracks[i].get_id())
+    id_index = bytearray(ID_ENTRY.size * len(tracks))
+    for i, position in enumerate(positions):
+        ID_ENTRY.pack_into(id_index, i * ID_ENTRY.size, tracks[position].get_id(), position)
+
+    entries = bytearray(STRING_ENTRY.size * len(strings))
+    offset = 0
+    for i, data in enumerate(strings):
+        STRING_ENTRY.pack_into(entries, i * STRING_ENTRY.size, offset, len(data))
+        offset += len(data)
+
+    records_offset = HEADER.size
+    id_index_offset = records_offset + len(records)
+    strings_offset = id_index_offset + len(id_index)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(tracks), len(strings),
+                         strings_offset, records_offset, id_index_offset)
+    atomic_write_bytes(file_path, b"".join([header, records, id_index, entries] + strings))
+
+
+class SnapshotReader:
+    """
+    Read-only, memory-mapped view of a binary library snapshot.
+
+    Opening only reads the header, so it takes the same time for any
+    library size. Tracks are decoded from their fixed-width record the
+    first time they are accessed and cached, strings are decoded once
+    and shared by every track that use them.
+
+    Attributes:
+        __file: Open snapshot file
+        __map: Read-only memory map of the file
+        __count: Number of tracks in snapshot
+        __records_offset: Byte offset of first track record
+        __id_index_offset: Byte offset of id index
+        __entries_offset: Byte offset of string table entries
+        __blob_offset: Byte offset of string data
+        __string_count: Number of strings in string table
+        __strings: Decoded strings by id
+        __tracks: Decoded tracks by position
+    """
+    def __init__(self, file_path):
+        self.__file = open(file_path, 'rb')
+        self.__map = None
+        try:
+            self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self.__map) < HEADER.size:
+                raise ValueError("Snapshot file is too short")
+            (magic, version, _, self.__count, self.__string_count, strings_offset,
+             self.__records_offset, self.__id_index_offset) = HEADER.unpack_from(self.__map, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a library snapshot file")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot version: {version}")
+            self.__entries_offset = strings_offset
+            self.__blob_offset = strings_offset + STRING_ENTRY.size * self.__string_count
+            if self.__blob_offset > len(self.__map):
+                raise ValueError("Snapshot file is truncated")
+        except BaseException:
+            self.close()
+            raise
+        self.__strings = {}
+        self.__tracks = {}
+
+    # Number of tracks in snapshot
+    def __len__(self):
+        return self.__count
+
+    # Get track at position (library sort order), decoded on first access
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.__count
+        if not 0 <= index < self.__count:
+            raise IndexError("Snapshot index out of range")
+
+        track = self.__tracks.get(index)
+        if track is None:
+            track_id, title, artist, album, duration, _, flags = RECORD.unpack_from(
+                self.__map, self.__records_offset + index * RECORD.size)
+            artist = self.__string(artist)
+            if flags & FLAG_ARTIST_LIST:
+                artist = artist.split(ARTIST_SEPARATOR)
+            track = Track(self.__string(title), artist,
+                          self.__string(album), self.__string(duration))
+            track.set_id(track_id)
+            self.__tracks[index] = track
+        return track
+
+    # Get track by library track id (binary search on id index), or None
+    def find_id(self, track_id):
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            entry_id, position = ID_ENTRY.unpack_from(
+                self.__map, self.__id_index_offset + middle * ID_ENTRY.size)
+            if entry_id == track_id:
+                return self[position]
+            if entry_id < track_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    # Position of first track with sort key >= key (binary search)
+    def lower_bound(self, key):
+        low, high = 0, self.__count
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle].get_sort_key() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # Get track with exactly this sort key, or None
+    def find_key(self, key):
+        position = self.lower_bound(key)
+        if position < self.__count and self[position].get_sort_key() == key:
+            return self[position]
+        return None
+
+    # Get tracks at positions start to stop (stop excluded, clamped)
+    def get_range(self, start, stop):
+        return [self[i] for i in range(max(start, 0), min(stop, self.__count))]
+
+    # Iterate tracks in library sort order
+    def __iter__(self):
+        for i in range(self.__count):
+            yield self[i]
+
+    # Decode string by id (cached)
+    def __string(self, string_id):
+        text = self.__strings.get(string_id)
+        if text is None:
+            offset, length = STRING_ENTRY.unpack_from(
+                self.__map, self.__entries_offset + string_id * STRING_ENTRY.size)
+            start = self.__blob_offset + offset
+            text = self.__map[start:start + length].decode("utf-8")
+            self.__strings[string_id] = text
+        return text
+
+    # Unmap and close file (decoded tracks stay valid)
+    def close(self):
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__file.close()
+
+
+class SnapshotOverlay:
+    """
+    Binary snapshot plus the few tracks added since it was written.
+
+    Library replays the mutation log (and later single adds) into this
+    overlay instead of building the tree, so startup stays O(log n) per
+    logged track. Added tracks are kept in a small list sorted by sort
+    key together with their position in the merged order. Reads merge
+    the two: positions before an added track come from the snapshot
+    shifted by the added tracks in front of them.
+
+    Attributes:
+        __reader: SnapshotReader of the snapshot file
+        __added: Added tracks in sort order
+        __keys: Sort keys of added tracks (same order, for bisect)
+        __positions: Merged position of each added track (ascending)
+        __ids: Track id -> added track
+    """
+    def __init__(self, reader):
+        self.__reader = reader
+        self.__added = []
+        self.__keys = []
+        self.__positions = []
+        self.__ids = {}
+
+    # Number of tracks in snapshot and overlay
+    def __len__(self):
+        return len(self.__reader) + len(self.__added)
+
+    # Get track at merged position
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Snapshot index out of range")
+        slot = bisect_left(self.__positions, index)
+        if slot < len(self.__positions) and self.__positions[slot] == index:
+            return self.__added[slot]
+        return self.__reader[index - slot]  # `slot` added tracks come first
+
+    # Get tracks at positions start to stop (stop excluded, clamped)
+    def get_range(self, start, stop):
+        return [self[i] for i in range(max(start, 0), min(stop, len(self)))]
+
+    # Position of first track with sort key >= key
+    def lower_bound(self, key):
+        return self.__reader.lower_bound(key) + bisect_left(self.__keys, key)
+
+    # Get track with exactly this sort key, or None
+    def find_key(self, key):
+        slot = bisect_left(self.__keys, key)
+        if slot < len(self.__keys) and self.__keys[slot] == key:
+            return self.__added[slot]
+        return self.__reader.find_key(key)
+
+    # Get track by library track id, or None
+    def find_id(self, track_id):
+        track = self.__ids.get(track_id)
+        return track if track is not None else self.__reader.find_id(track_id)
+
+    # Add track that is not in the snapshot (caller checked with find_key)
+    def add(self, track):
+        key = track.get_sort_key()
+        slot = bisect_left(self.__keys, key)
+        position = self.__reader.lower_bound(key) + slot
+        self.__added.insert(slot, track)
+        self.__keys.insert(slot, key)
+        self.__positions.insert(slot, position)
+        for i in range(slot + 1, len(self.__positions)):
+            self.__positions[i] += 1  # Shifted by the new track
+        self.__ids[track.get_id()] = track
+
+    # Iterate tracks in library sort order
+    def __iter__(self):
+        return merge(self.__reader, self.__added, key=lambda track: track.get_sort_key())
+
+    # Close snapshot file (decoded tracks stay valid)
+    def close(self):
+        self.__reader.close()
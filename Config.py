@@ -0,0 +1,26 @@
+import os
+
+# Application settings, each can be overridden with an environment variable
+
+# Where data is stored:
+#   "json"   - JSON files in data/ (default)
+#   "sqlite" - one SQLite database (indexed tables, single-row updates)
+STORAGE_BACKEND = os.environ.get("LTTM_STORAGE", "json").lower()
+
+# Database file used by the sqlite backend
+SQLITE_PATH = os.environ.get("LTTM_SQLITE_PATH", "data/music.db")
+
+# Format of the library snapshot (the JSON backend only):
+#   "json"   - data/library.json (default)
+#   "binary" - data/library.bin, memory-mapped and decoded lazily on startup
+SNAPSHOT_FORMAT = os.environ.get("LTTM_SNAPSHOT", "json").lower()
+
+# Binary library snapshot used when SNAPSHOT_FORMAT is "binary"
+BINARY_SNAPSHOT_PATH = os.environ.get("LTTM_SNAPSHOT_PATH", "data/library.bin")
+
+# Print startup timing report (time to first menu, time each part loads)
+SHOW_TIMINGS = os.environ.get("LTTM_TIMING", "0") not in ("", "0")
+
+# Processes used to parse files when importing a whole directory
+# (0 = one per CPU)
+IMPORT_WORKERS = int(os.environ.get("LTTM_IMPORT_WORKERS", "0")) or None
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+from Storage import atomic_write_json
+
+# Files only ever appended to by their producers (new rows at the end)
+APPEND_ONLY_EXTENSIONS = (".csv",)
+
+# Bytes hashed at a time
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ImportManifest:
+    """
+    Record of files already imported from an import directory.
+
+    For every imported file the manifest keeps its size, modification
+    time, SHA-256 hash and line count. check() uses them to decide what a
+    re-import has to read:
+      - same size and mtime: unchanged, skipped without opening the file
+      - same hash (only touched): unchanged
+      - append-only file (CSV) whose old bytes are unchanged: only the
+        rows after the old size (byte offset) are read
+      - anything else: the whole file is read again
+
+    Attributes:
+        __file_path: Path of manifest JSON file
+        __entries: File path -> {"size", "mtime", "hash", "lines"}
+    """
+    def __init__(self, file_path):
+        self.__file_path = file_path
+        self.__entries = {}
+        self.__load()
+
+    # Check file against manifest
+    # Returns None if the file has not changed since it was recorded, else
+    # (offset, first_line, entry): byte offset and line number to read
+    # from (0 and 1 = whole file) and the entry to record once imported
+    def check(self, path):
+        stat = os.stat(path)
+        old = self.__entries.get(path)
+        if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+            return None
+
+        digest = hashlib.sha256()
+        size = 0
+        lines = 0
+        offset = 0
+        first_line = 1
+        with open(path, 'rb') as f:
+            appendable = path.lower().endswith(APPEND_ONLY_EXTENSIONS)
+            if old and appendable and 0 < old["size"] <= stat.st_size:
+                # Hash old part first: if it is unchanged, only the tail is new
+                last_byte = b""
+                while size < old["size"]:
+                    block = f.read(min(HASH_BLOCK_SIZE, old["size"] - size))
+                    if not block:
+                        break
+                    digest.update(block)
+                    size += len(block)
+                    lines += block.count(b"\n")
+                    last_byte = block[-1:]
+                if digest.hexdigest() == old["hash"] and last_byte == b"\n":
+                    offset = size
+                    first_line = lines + 1
+
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+                lines += block.count(b"\n")
+
+        entry = {"size": size, "mtime": stat.st_mtime_ns,
+                 "hash": digest.hexdigest(), "lines": lines}
+        if old and entry["hash"] == old["hash"]:
+            self.record(path, entry)  # Touched but same content
+            return None
+        return offset, first_line, entry
+
+    # Remember file as imported (entry from check)
+    def record(self, path, entry):
+        self.__entries[path] = entry
+
+    # Write manifest file
+    def save(self):
+        atomic_write_json(self.__file_path, self.__entries)
+
+    # Load manifest file (missing or broken file = nothing imported yet)
+    def __load(self):
+        if not os.path.exists(self.__file_path):
+            return
+        try:
+            with open(self.__file_path, 'r') as f:
+                self.__entries = json.load(f)
+        except (ValueError, OSError):
+            print("Error loading import manifest, importing all files again")
@@ -0,0 +1,309 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from Track import Track, parse_duration
+
+# Fields every imported track record must have
+REQUIRED_FIELDS = ("title", "artist", "album", "duration")
+
+# Rows parsed and inserted together when streaming big files
+DEFAULT_CHUNK_SIZE = 1000
+
+# Keep only this many error messages (counts stay exact)
+MAX_REPORTED_ERRORS = 100
+
+# Characters read at a time when streaming JSON files
+JSON_READ_SIZE = 64 * 1024
+
+# File types picked up when importing a whole directory
+IMPORT_EXTENSIONS = (".json", ".csv")
+
+
+# Turn artist cell into string or list (multiple artists separated by comma)
+def parse_artist(value):
+    if "," in value:
+        return [artist.strip() for artist in value.split(",") if artist.strip()]
+    return value.strip()
+
+
+# Build Track from an imported record (dict with title/artist/album/duration)
+# Title, album and duration must be text, artist text or a list of texts,
+# and duration mm:ss or h:mm:ss.
+# Raises ValueError if the record is not a valid track
+def track_from_record(record):
+    if not isinstance(record, dict):
+        raise ValueError("Track record must be an object")
+    for key in REQUIRED_FIELDS:
+        if record.get(key) in (None, "", []):
+            raise ValueError("Missing required fields in track")
+
+    for key in ("title", "album"):
+        if not isinstance(record[key], str):
+            raise ValueError(f"Invalid {key} {record[key]!r}, must be text")
+    artist = record["artist"]
+    artists = artist if isinstance(artist, list) else [artist]
+    if not all(isinstance(name, str) and name.strip() for name in artists):
+        raise ValueError(f"Invalid artist {artist!r}, must be text or a list of texts")
+    if not isinstance(record["duration"], str) or parse_duration(record["duration"]) is None:
+        raise ValueError(f"Invalid duration {record['duration']!r}, use mm:ss or h:mm:ss")
+
+    return Track(
+        record["title"],
+        record["artist"],
+        record["album"],
+        record["duration"]
+    )
+
+
+# Stream CSV file as chunks of validated tracks
+# First row must be a header naming the title, artist, album and duration
+# columns (any order, extra columns ignored). Multi-artist cells are quoted
+# and comma separated, e.g. "Ava Rivers, Neon Skies".
+# Yields (tracks, errors) per chunk so memory stay flat for any file size.
+# offset > 0 reads only the rows starting at that byte offset (rows appended
+# since an earlier import), first_line is the line number found there.
+def iter_csv_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE, offset=0, first_line=1):
+    with open(file_path, 'rb') as raw:
+        f = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        reader = csv.reader(f)
+
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = {name.strip().casefold(): i for i, name in enumerate(header)}
+        missing = [key for key in REQUIRED_FIELDS if key not in columns]
+        if missing:
+            raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+
+        line_base = 0  # Added to reader.line_num to get file line number
+        if offset:
+            # Header read above, now jump to the appended rows
+            raw = f.detach()
+            raw.seek(offset)
+            f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            reader = csv.reader(f)
+            line_base = first_line - 1
+
+        tracks = []
+        errors = []
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue  # Skip blank lines
+
+            try:
+                record = {}
+                for key in REQUIRED_FIELDS:
+                    index = columns[key]
+                    record[key] = row[index].strip() if index < len(row) else ""
+                record["artist"] = parse_artist(record["artist"])
+                tracks.append(track_from_record(record))
+            except (ValueError, IndexError) as e:
+                errors.append(f"Line {line_base + reader.line_num}: {str(e)}")
+
+            if len(tracks) + len(errors) >= chunk_size:
+                yield tracks, errors
+                tracks = []
+                errors = []
+
+        if tracks or errors:
+            yield tracks, errors
+
+
+# Stream the elements of a JSON file holding one top-level array, one at
+# a time, using only the stdlib decoder. Memory holds the current element
+# and a small read buffer, never the whole file. Raises ValueError (with
+# the character position) as soon as the file stops being valid JSON.
+def iter_json_array(file_path, read_size=JSON_READ_SIZE):
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        buffer = ""
+        pos = 0  # Parse position in buffer
+        dropped = 0  # Characters of the file already cut from buffer
+        eof = False
+
+        # Append more text to buffer (at least `size` characters unless
+        # the file ends), drop parsed text. Returns False at end of file.
+        def read_more(size=read_size):
+            nonlocal buffer, pos, dropped, eof
+            chunk = "" if eof else f.read(size)
+            if not chunk:
+                eof = True
+                return False
+            dropped += pos
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        # Skip whitespace, return next character ("" at end of file)
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not read_more():
+                    return ""
+
+        def error(message, at=None):
+            return ValueError(f"{message} at character {dropped + (pos if at is None else at)}")
+
+        # Step over the closing "]", only whitespace may follow (as json.load)
+        def finish():
+            nonlocal pos
+            pos += 1
+            if peek() != "":
+                raise error("Extra data after JSON array")
+
+        if peek() != "[":
+            raise error("Expected a JSON array")
+        pos += 1
+        if peek() == "]":
+            finish()
+            return
+
+        while True:
+            if peek() == "":
+                raise error("Unexpected end of file")
+
+            # Decode one element, read more while it is cut off by the end
+            # of the buffer (read size doubles so big elements stay linear)
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    # Errors away from the buffer end are real syntax errors
+                    cut_off = (e.pos >= len(buffer) - 6 or
+                               e.msg.startswith("Unterminated string"))
+                    if cut_off and read_more(max(read_size, len(buffer) - pos)):
+                        continue
+                    raise error(f"Invalid JSON ({e.msg})", e.pos)
+                # A number at the end of the buffer could go on in the
+                # next chunk ("1" of "12", "0" of "0.5")
+                if buffer[end:].lstrip("0123456789.eE+-") == "" and read_more():
+                    continue
+                break
+
+            pos = end
+            yield element
+
+            char = peek()
+            if char == "]":
+                finish()
+                return
+            if char == "":
+                raise error("Unexpected end of file")
+            if char != ",":
+                raise error("Expected ',' or ']'")
+            pos += 1
+
+
+# Stream JSON array of track records as chunks of validated tracks
+# Yields (tracks, errors) per chunk like iter_csv_chunks
+def iter_json_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    tracks = []
+    errors = []
+    try:
+        for number, record in enumerate(iter_json_array(file_path), 1):
+            try:
+                tracks.append(track_from_record(record))
+            except ValueError as e:
+                errors.append(f"Track {number}: {str(e)}")
+            except Exception as e:
+                errors.append(f"Track {number}: Error with track: {str(e)}")
+
+            if len(tracks) + len(errors) >= chunk_size:
+                yield tracks, errors
+                tracks = []
+                errors = []
+    except ValueError:
+        # Broken file: hand over tracks read so far, then report the error
+        if tracks or errors:
+            yield tracks, errors
+        raise
+
+    if tracks or errors:
+        yield tracks, errors
+
+
+# List importable files of a directory (sorted, so merge order is fixed)
+def list_import_files(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMPORT_EXTENSIONS)
+                  and os.path.isfile(os.path.join(directory, name)))
+
+
+# Parse and validate one track file (run in a worker process)
+# Returns a dict with the file's unique tracks as (title, artist, album,
+# duration) rows (cheap to send between processes), duplicate and skip
+# counts, error messages and "file_error" if the file could not be read.
+# CSV files can be read from a byte offset (see iter_csv_chunks).
+def parse_track_file(file_path, offset=0, first_line=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    result = {"file": file_path, "rows": [], "duplicates": 0, "skipped": 0,
+              "errors": [], "file_error": None}
+    if file_path.lower().endswith(".json"):
+        chunks = iter_json_chunks(file_path, chunk_size)
+    elif file_path.lower().endswith(".csv"):
+        chunks = iter_csv_chunks(file_path, chunk_size, offset, first_line)
+    else:
+        result["file_error"] = "Unsupported file format! Use .json or .csv"
+        return result
+
+    seen = set()
+    try:
+        for tracks, chunk_errors in chunks:
+            for track in tracks:
+                key = track.get_sort_key()
+                if key in seen:
+                    result["duplicates"] += 1  # Same track twice in file
+                    continue
+                seen.add(key)
+                result["rows"].append((track.get_title(), track.get_artist(),
+                                       track.get_album(), track.get_duration()))
+            result["skipped"] += len(chunk_errors)
+            result["errors"].extend(chunk_errors[:MAX_REPORTED_ERRORS - len(result["errors"])])
+    except (ValueError, csv.Error, OSError) as e:
+        result["file_error"] = str(e)  # Rows read before the error are kept
+    return result
+
+
+# Parse track files on a process pool, yield results in file order
+# workers=None uses one process per CPU. Parses in this process when only
+# one worker would run or the platform cannot start processes.
+# At most `workers` files are parsed or waiting at a time (plus the one
+# the caller is merging), so parsed rows of a big directory never pile
+# up in this process while the caller merges slower than workers parse.
+# Workers are spawned, not forked: this process may be running threads
+# (fuzzy index linker, queue save timer) and a fork could copy a lock
+# one of them holds.
+# offsets/first_lines (optional, one per file) go to parse_track_file.
+def iter_parsed_files(file_paths, workers=None, offsets=None, first_lines=None):
+    offsets = offsets or [0] * len(file_paths)
+    first_lines = first_lines or [1] * len(file_paths)
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    if workers > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ImportError):
+            pool = None
+        if pool:
+            with pool:
+                jobs = zip(file_paths, offsets, first_lines)
+                pending = deque(pool.submit(parse_track_file, *job)
+                                for job in islice(jobs, workers))
+                while pending:
+                    result = pending.popleft().result()
+                    # Refill the window before the caller merges this file
+                    for job in islice(jobs, 1):
+                        pending.append(pool.submit(parse_track_file, *job))
+                    yield result
+            return
+
+    for job in zip(file_paths, offsets, first_lines):
+        yield parse_track_file(*job)
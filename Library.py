@@ -1,145 +1,730 @@
+import csv
 import json
 import os
+import threading
+from contextlib import contextmanager
 from Track import Track
 from Album import AlbumManager
+from TrackTable import TrackTable
+from ArtistRegistry import ArtistRegistry
+from SearchIndex import TrigramIndex, FieldIndex, FuzzyIndex, parse_query
+from Storage import atomic_write_json
+from BinarySnapshot import write_snapshot, SnapshotReader, SnapshotOverlay
+import Config
+from MutationLog import MutationLog
+from ImportManifest import ImportManifest
+from SQLiteStore import get_store
+from Importer import (iter_csv_chunks, iter_json_chunks, list_import_files,
+                      iter_parsed_files, DEFAULT_CHUNK_SIZE, MAX_REPORTED_ERRORS)
 
-# BST Node for storing tracks
-class BSTNode:
+# Fold the mutation log into a new snapshot after this many records
+COMPACT_THRESHOLD = 1000
+
+# AVL Node for storing tracks
+class AVLNode:
     """
-    Represent a node in Binary Search Tree for library.
+    Represent a node in AVL tree (self-balancing BST) for library.
     
-    Each node store a track and have left and right child pointers.
+    Each node store a track, left and right child pointers, the
+    height of its subtree so the tree can rebalance after insert, and
+    the size of its subtree for positional (rank/select) lookups.
     
     Attributes:
         track: The track stored in this node
         left: Left child node with smaller value
         right: Right child node with larger value
+        height: Height of subtree rooted at this node (leaf = 1)
+        size: Number of nodes in subtree rooted at this node
     """
     def __init__(self, track):
         self.track = track
         self.left = None
         self.right = None
+        self.height = 1
+        self.size = 1
+
+# Read-only view over part of library snapshot
+class TrackSlice:
+    """
+    Represent a read-only window over the library snapshot.
+    
+    The view only keep a reference to the snapshot tuple and the bounds,
+    so getting a page of tracks does not copy the snapshot.
+    
+    Attributes:
+        __snapshot: Sorted tuple of tracks the view read from
+        __start: First snapshot index in this view
+        __stop: Snapshot index after the last track in this view
+    """
+    def __init__(self, snapshot, start, stop):
+        self.__snapshot = snapshot
+        self.__start = max(0, min(start, len(snapshot)))
+        self.__stop = max(self.__start, min(stop, len(snapshot)))
+    
+    # Number of tracks in this view
+    def __len__(self):
+        return self.__stop - self.__start
+    
+    # Get track by position inside the view
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TrackSlice index out of range")
+        return self.__snapshot[self.__start + index]
+    
+    # Iterate tracks in library order
+    def __iter__(self):
+        for i in range(self.__start, self.__stop):
+            yield self.__snapshot[i]
+    
+    # Index of first track of this view in the whole library
+    def get_start(self):
+        return self.__start
 
 class Library:
     """
-    Manage music library using Binary Search Tree.
+    Manage music library using AVL tree (self-balancing BST).
     
     This class store all tracks in sorted order and provide search.
+    Tree stay balanced so insert and lookup are O(log n) even when
+    tracks are loaded in sorted order, and all tree walks are iterative
+    so there is no recursion limit on big libraries.
     It can import tracks from JSON and CSV files.
     
+    Single adds are appended to a mutation log (one small record each)
+    instead of rewriting library.json and albums.json. The log is folded
+    into a new library snapshot in the background every COMPACT_THRESHOLD
+    records, and bulk transactions write a snapshot directly when they
+    commit. Album changes are saved by the album manager at the same
+    time, only for the albums that changed (see AlbumManager).
+    With the sqlite storage backend (see Config.py) each add is a single
+    row insert into the database instead, and transactions commit once.
+    Counting, paging, positional lookups and find_track are then served
+    by SQL queries on the tracks table (see SQLiteStore.LibraryView)
+    the same way as from a binary snapshot below.
+    
+    With SNAPSHOT_FORMAT "binary" the snapshot is a memory-mapped binary
+    file instead of library.json. Counting, paging, positional lookups
+    and find_track are served straight from the file (tracks decoded on
+    access), and the tree and search indexes are only built the first
+    time something needs them (a search, a full listing, a bulk import).
+    Tracks from the mutation log and single adds go into a small sorted
+    overlay on top of the file (see SnapshotOverlay).
+    
+    Album grouping is loaded on the first get_album_manager call (or when
+    a snapshot is written). Tracks added before that are kept in a
+    pending list and grouped when the albums load.
+    
+    Every track gets a stable integer id when it enters the library (the
+    row id with the sqlite backend). Albums, playlists and queue save only
+    these ids and get the tracks back with get_track_by_id/resolve_track,
+    so each track is kept once in memory and once on disk.
+    
+    Durations and string ids of all tracks are also kept in a TrackTable
+    (array columns), used for album, playlist and queue totals and for
+    whole-catalog statistics (totals, histogram, per album/artist).
+    
     Attributes:
-        __root: BST root node for store tracks
-        __file_path: Path to library JSON file
+        __root: AVL root node for store tracks
+        __version: Counter bumped on every change to the tree
+        __snapshot: Cached sorted tuple of tracks (valid for __snapshot_version)
+        __title_index: Trigram index over titles for substring search
+        __field_index: Token indexes over title, artist and album
+        __fuzzy_index: BK-tree over title and artist terms for typo search
+        __artists: Artist registry (artist -> tracks and albums)
+        __file_path: Path to library JSON file (snapshot)
+        __binary_path: Path to binary snapshot, None when using JSON
+        __base: Memory-mapped snapshot (or the SQLite store's library
+            view) serving reads until the tree is built, None once tree
+            holds the library
+        __log: Mutation log of adds since the last snapshot
+        __store: SQLiteStore when sqlite backend is configured, else None
+        __compaction: Background thread writing a snapshot, or None
+        __track_table: Track id -> Track for tracks in the tree
+        __next_id: Id given to the next new track
+        __columns: TrackTable with a row per library track
+        __columns_complete: True once tracks still in the base have rows too
         __album_manager: Manager for organize tracks into albums
+        __albums_loaded: True once albums were loaded into album manager
+        __pending_album_tracks: Tracks added before albums were loaded
+        __transaction_depth: Number of open transactions (0 = log every add)
+        __transaction_inserts: Tracks inserted since outermost transaction began
     """
     def __init__(self):
-        self.__root = None  # BST root
+        self.__root = None  # AVL root
+        self.__version = 0  # Bumped on every mutation
+        self.__snapshot = ()  # Cached sorted tracks
+        self.__snapshot_version = 0  # Version the snapshot was built for
+        self.__title_index = TrigramIndex()  # Title substring search index
+        self.__field_index = FieldIndex()  # Title/artist/album token index
+        self.__fuzzy_index = FuzzyIndex()  # Typo-tolerant title/artist index
+        self.__artists = ArtistRegistry()  # Per-artist track and album index
         self.__file_path = "data/library.json"
-        self.__album_manager = AlbumManager()  # Album manager
-        self.__load_from_file()
-    
-    # Compare two tracks based on requirements
-    # Returns: -1 if t1 < t2, 0 if equal, 1 if t1 > t2
-    def __compare_tracks(self, t1, t2):
-        # First compare by title
-        if t1.get_title().lower() < t2.get_title().lower():
-            return -1
-        elif t1.get_title().lower() > t2.get_title().lower():
-            return 1
-        
-        # If titles are same, compare by artist
-        artist1 = t1.get_main_artist()
-        artist2 = t2.get_main_artist()
-        if artist1.lower() < artist2.lower():
+        self.__log = MutationLog("data/library.log")
+        self.__store = get_store()
+        self.__binary_path = (Config.BINARY_SNAPSHOT_PATH
+                              if Config.SNAPSHOT_FORMAT == "binary" and self.__store is None
+                              else None)
+        self.__base = None  # SnapshotReader until the tree is built
+        self.__track_table = {}  # Track id -> Track
+        self.__next_id = 1
+        self.__columns = TrackTable()  # Column store, rows added on register
+        self.__columns_complete = False
+        self.__compaction = None
+        self.__album_manager = AlbumManager(self.__columns)  # Album manager
+        self.__albums_loaded = False  # Albums load on first use
+        self.__pending_album_tracks = []
+        self.__transaction_depth = 0  # Open bulk transactions
+        self.__transaction_inserts = 0  # Tracks inserted by open transaction
+        if self.__store:
+            self.__load_from_store()
+        else:
+            self.__load_from_file()
+        self.__fuzzy_index.link_in_background()
+    
+    # Compare a sort key with the key of a track
+    # Order is title -> main artist -> album -> duration, all precomputed
+    # in Track.get_sort_key() so no string work happens per comparison
+    # Returns: -1 if key < track's key, 0 if equal, 1 if greater
+    def __compare_keys(self, key, track):
+        other = track.get_sort_key()
+        if key < other:
             return -1
-        elif artist1.lower() > artist2.lower():
+        elif key > other:
             return 1
+        return 0  # Completely equal
+    
+    # Height of node (empty subtree = 0)
+    def __height(self, node):
+        return node.height if node else 0
+    
+    # Size of subtree (empty subtree = 0)
+    def __size(self, node):
+        return node.size if node else 0
+    
+    # Recalculate height and subtree size of node from its children
+    def __update_height(self, node):
+        node.height = 1 + max(self.__height(node.left), self.__height(node.right))
+        node.size = 1 + self.__size(node.left) + self.__size(node.right)
+    
+    # Rotate subtree to the left, return new subtree root
+    def __rotate_left(self, node):
+        new_root = node.right
+        node.right = new_root.left
+        new_root.left = node
+        self.__update_height(node)
+        self.__update_height(new_root)
+        return new_root
+    
+    # Rotate subtree to the right, return new subtree root
+    def __rotate_right(self, node):
+        new_root = node.left
+        node.left = new_root.right
+        new_root.right = node
+        self.__update_height(node)
+        self.__update_height(new_root)
+        return new_root
+    
+    # Restore AVL balance at node, return new subtree root
+    def __rebalance(self, node):
+        self.__update_height(node)
+        balance = self.__height(node.left) - self.__height(node.right)
         
-        # If artists are same, compare by album
-        if t1.get_album().lower() < t2.get_album().lower():
-            return -1
-        elif t1.get_album().lower() > t2.get_album().lower():
-            return 1
+        if balance > 1:
+            # Left heavy (left-right case needs extra rotation first)
+            if self.__height(node.left.left) < self.__height(node.left.right):
+                node.left = self.__rotate_left(node.left)
+            return self.__rotate_right(node)
         
-        # If albums are same, compare by duration
-        if t1.duration_to_seconds() < t2.duration_to_seconds():
-            return -1
-        elif t1.duration_to_seconds() > t2.duration_to_seconds():
-            return 1
+        if balance < -1:
+            # Right heavy (right-left case needs extra rotation first)
+            if self.__height(node.right.right) < self.__height(node.right.left):
+                node.right = self.__rotate_right(node.right)
+            return self.__rotate_left(node)
         
-        return 0  # Completely equal
+        return node
     
-    # Insert track into BST
-    def __insert_recursive(self, node, track, inserted_flag):
-        if node is None:
-            inserted_flag[0] = True  # Mark as inserted
-            return BSTNode(track)
+    # Insert track into AVL tree (iterative)
+    # Returns True if inserted, False if track already exists
+    def __insert(self, track):
+        self.__ensure_tree()
+        path = []  # (node, went_left) pairs from root to insert point
+        node = self.__root
+        key = track.get_sort_key()
         
-        comparison = self.__compare_tracks(track, node.track)
+        while node:
+            comparison = self.__compare_keys(key, node.track)
+            if comparison == 0:
+                return False  # Track already exists (don't insert duplicate)
+            went_left = comparison < 0
+            path.append((node, went_left))
+            node = node.left if went_left else node.right
         
-        if comparison < 0:
-            node.left = self.__insert_recursive(node.left, track, inserted_flag)
-        elif comparison > 0:
-            node.right = self.__insert_recursive(node.right, track, inserted_flag)
-        # If comparison == 0, track already exists (don't insert duplicate)
-        # inserted_flag remains False
+        child = AVLNode(track)
         
-        return node
+        # Walk back up the path, attach child and rebalance each ancestor
+        for node, went_left in reversed(path):
+            if went_left:
+                node.left = child
+            else:
+                node.right = child
+            child = self.__rebalance(node)
+        
+        self.__root = child
+        self.__version += 1  # Invalidate cached snapshot
+        self.__register(track)
+        self.__title_index.add(track)
+        self.__field_index.add(track)
+        self.__fuzzy_index.add(track)
+        self.__artists.add_track(track)
+        return True
+    
+    # Find the node holding a track equal to given track (iterative)
+    def __find_node(self, track):
+        node = self.__root
+        key = track.get_sort_key()
+        while node:
+            comparison = self.__compare_keys(key, node.track)
+            if comparison == 0:
+                return node
+            node = node.left if comparison < 0 else node.right
+        return None
+    
+    # Give track a library id (if it has none) and add it to track table
+    def __register(self, track):
+        if track.get_id() is None:
+            track.set_id(self.__next_id)
+        self.__next_id = max(self.__next_id, track.get_id() + 1)
+        self.__track_table[track.get_id()] = track
+        self.__columns.row_for(track)
+    
+    # Get track by library track id, or None - O(1) (O(log n) while
+    # reading from the binary snapshot or the store)
+    def get_track_by_id(self, track_id):
+        track = self.__track_table.get(track_id)
+        if track is None and self.__base is not None:
+            track = self.__base.find_id(track_id)
+        return track
+    
+    # Get track for a reference saved by Track.to_ref (track id, or track
+    # dict in older files), None if id is unknown. Dicts give the library's
+    # own track when it has an equal one.
+    def resolve_track(self, ref):
+        if isinstance(ref, dict):
+            track = Track.from_dict(ref)
+            return self.find_track(track) or track
+        return self.get_track_by_id(ref)
+    
+    # Build tree and indexes from the base (first use)
+    def __ensure_tree(self):
+        if self.__base is None:
+            return
+        base = self.__base
+        self.__base = None  # Inserts below go straight into the tree
+        for track in base:
+            self.__insert(track)
+        base.close()
+        self.__fuzzy_index.link_in_background()
+    
+    # Load album grouping (first use), then group tracks added since startup
+    def __ensure_albums(self):
+        if self.__albums_loaded:
+            return
+        self.__albums_loaded = True
+        if self.__store:
+            self.__album_manager.load_from_store(self.get_track_by_id)
+        else:
+            self.__album_manager.load_from_file(self.resolve_track)
+        
+        for track in self.__pending_album_tracks:
+            self.__album_manager.add_track_to_album(track, save=False)
+        self.__pending_album_tracks = []
+    
+    # Add track to its album, or remember it until albums are loaded
+    def __add_to_album(self, track):
+        if self.__albums_loaded:
+            self.__album_manager.add_track_to_album(track, save=False)
+        else:
+            self.__pending_album_tracks.append(track)
+    
+    # Get the stored track equal to given track, or None
+    def find_track(self, track):
+        if self.__base is not None:
+            return self.__base.find_key(track.get_sort_key())
+        node = self.__find_node(track)
+        return node.track if node else None
+    
+    # Insert track into the base while reads are served from it (tree
+    # stays unbuilt), else into the tree
+    # Returns True if inserted, False if track already exists
+    def __insert_track(self, track):
+        if self.__base is None:
+            return self.__insert(track)
+        if self.__base.find_key(track.get_sort_key()) is not None:
+            return False
+        self.__register(track)
+        self.__base.add(track)
+        self.__version += 1
+        return True
     
     # Add track to library
     def add_track(self, track):
-        inserted_flag = [False]  # Use list to pass by reference
-        self.__root = self.__insert_recursive(self.__root, track, inserted_flag)
+        if (self.__base is not None or self.__store) and self.find_track(track) is not None:
+            return False  # Duplicate, found without building tree or writing a row
+        if self.__store:
+            # Single row insert (committed now or when transaction ends),
+            # the row id becomes the track id
+            track.set_id(self.__store.add_library_track(track))
+        inserted = self.__insert_track(track)
         
         # Only add to album and save if track was actually inserted
-        if inserted_flag[0]:
-            # Automatically add track to its album
-            self.__album_manager.add_track_to_album(track)
-            self.__save_to_file()
+        if inserted:
+            if self.__transaction_depth:
+                self.__transaction_inserts += 1
+            if self.__store and not self.__albums_loaded:
+                # Album row written now, grouped when albums load
+                self.__store.add_album_track(track.get_album(), track)
+            
+            # Automatically add track to its album (saved with snapshot)
+            self.__add_to_album(track)
+            if self.__store is None and self.__transaction_depth == 0:
+                # O(1) save: append one record, snapshot now and then
+                self.__log.append({"op": "add", "id": track.get_id(),
+                                   "track": track.to_dict()})
+                if self.__log.get_count() >= COMPACT_THRESHOLD:
+                    self.compact(background=True)
         
-        return inserted_flag[0]  # Return True if inserted, False if duplicate
+        return inserted  # Return True if inserted, False if duplicate
+    
+    # Add many tracks in one transaction (files written once at the end)
+    # Returns number of tracks inserted, the rest were duplicates
+    def add_tracks(self, tracks):
+        inserted = 0
+        with self.transaction():
+            for track in tracks:
+                if self.add_track(track):
+                    inserted += 1
+        return inserted
+    
+    # Bulk transaction: inserts, album grouping and duplicate checks run in
+    # memory, library file is written once (atomically) and album changes
+    # saved once when the outermost transaction ends, if it inserted
+    # anything. Tracks already inserted stay in memory if an error
+    # happens, so files are still written to match.
+    @contextmanager
+    def transaction(self):
+        self.__transaction_depth += 1
+        if self.__transaction_depth == 1:
+            self.__transaction_inserts = 0
+            if self.__store:
+                self.__store.begin()
+        try:
+            yield self
+        finally:
+            self.__transaction_depth -= 1
+            if self.__transaction_depth == 0:
+                self.__commit()
+    
+    # Write library and albums once for everything done in transaction
+    # Nothing inserted and nothing logged: files are already up to date
+    def __commit(self):
+        if self.__store:
+            self.__store.commit()
+        elif self.__transaction_inserts or self.__log.get_count():
+            self.compact()
+        self.__fuzzy_index.link_in_background()
+    
+    # Fold mutation log into new library snapshot
+    # Album changes are saved first (appended to the album log, only the
+    # albums that changed), so the log records can be dropped after
+    # background=True writes the library file on a separate thread
+    def compact(self, background=False):
+        self.__ensure_tree()
+        self.__ensure_albums()
+        self.__wait_for_compaction()
+        self.__album_manager.save()
+        self.__log.begin_compaction()
+        
+        # Snapshot tuple is immutable, safe to write from another thread
+        tracks = self.get_snapshot()
+        
+        if background:
+            self.__compaction = threading.Thread(
+                target=self.__write_snapshot, args=(tracks,), daemon=True)
+            self.__compaction.start()
+        else:
+            self.__write_snapshot(tracks)
+    
+    # Write snapshot file, then drop the log records it contains
+    def __write_snapshot(self, tracks):
+        self.__save_to_file(tracks)
+        self.__log.finish_compaction()
+    
+    # Wait for background compaction to finish
+    def __wait_for_compaction(self):
+        if self.__compaction:
+            self.__compaction.join()
+            self.__compaction = None
+    
+    # Wait for background work (compaction, fuzzy index linking) to finish
+    def wait_idle(self):
+        self.__wait_for_compaction()
+        self.__fuzzy_index.wait_idle()
+    
+    # Make sure everything is on disk (call before exit)
+    # Fuzzy index linking is stopped, it only lives in memory
+    def close(self):
+        self.__fuzzy_index.stop_linking()
+        self.__wait_for_compaction()
+        self.__log.close()
+        self.__album_manager.close()
     
     # Get album manager
     def get_album_manager(self):
+        self.__ensure_albums()
         return self.__album_manager
     
-    # Get all tracks in sorted order (in-order traversal)
-    def __inorder_traversal(self, node, tracks_list):
-        if node:
-            self.__inorder_traversal(node.left, tracks_list)
+    # Get artist registry (artist -> tracks and albums of all library tracks)
+    def get_artist_registry(self):
+        self.__ensure_tree()
+        return self.__artists
+    
+    # Get all tracks in sorted order (iterative in-order traversal)
+    def __inorder_traversal(self, tracks_list):
+        stack = []
+        node = self.__root
+        while stack or node:
+            # Go as far left as possible
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
             tracks_list.append(node.track)
-            self.__inorder_traversal(node.right, tracks_list)
+            node = node.right
     
-    def get_all_tracks(self):
+    # Get position (0-based) of track in sorted library, or None if missing
+    # O(log n) using subtree sizes
+    def rank_of(self, track):
+        if self.__base is not None:
+            key = track.get_sort_key()
+            if self.__base.find_key(key) is None:
+                return None
+            return self.__base.lower_bound(key)
+        
+        rank = 0
+        node = self.__root
+        key = track.get_sort_key()
+        while node:
+            comparison = self.__compare_keys(key, node.track)
+            if comparison < 0:
+                node = node.left
+            elif comparison > 0:
+                rank += self.__size(node.left) + 1
+                node = node.right
+            else:
+                return rank + self.__size(node.left)
+        return None
+    
+    # Walk tracks in sorted order starting at position index (0-based)
+    # Reaching the start costs O(log n), then each next track is O(1) amortized
+    def __iter_from(self, index):
+        stack = []
+        node = self.__root
+        
+        # Descend to the index-th node, keep ancestors still to be visited
+        while node:
+            left_size = self.__size(node.left)
+            if index < left_size:
+                stack.append(node)
+                node = node.left
+            elif index > left_size:
+                index -= left_size + 1
+                node = node.right
+            else:
+                stack.append(node)
+                break
+        
+        return self.__walk_stack(stack)
+    
+    # Walk tracks in sorted order starting at the first title >= title_key
+    # (lower bound on casefolded title) - O(log n) to reach the start
+    def __iter_from_title(self, title_key):
+        stack = []
+        node = self.__root
+        
+        # Keep every node whose title is >= key, go left to find smaller ones
+        while node:
+            if node.track.get_sort_key()[0] >= title_key:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        
+        return self.__walk_stack(stack)
+    
+    # Continue iterative in-order walk from a stack of pending ancestors
+    def __walk_stack(self, stack):
+        while stack:
+            node = stack.pop()
+            yield node.track
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+    
+    # Get track at position index (0-based) in sorted order - O(log n)
+    def select(self, index):
+        if self.__base is not None:
+            return self.__base[index] if 0 <= index < len(self.__base) else None
+        if not 0 <= index < self.__size(self.__root):
+            return None
+        return next(self.__iter_from(index))
+    
+    # Get tracks on given page (1-based) - O(log n + page_size)
+    def get_page(self, page, page_size=10):
+        start_idx = (page - 1) * page_size
+        if page_size <= 0 or not 0 <= start_idx < self.get_track_count():
+            return []
+        
+        if self.__base is not None:
+            return self.__base.get_range(start_idx, start_idx + page_size)
+        
         tracks = []
-        self.__inorder_traversal(self.__root, tracks)
+        for track in self.__iter_from(start_idx):
+            tracks.append(track)
+            if len(tracks) == page_size:
+                break
         return tracks
     
+    # Get page number (1-based) that hold given track, or None if missing
+    def get_page_of(self, track, page_size=10):
+        rank = self.rank_of(track)
+        if rank is None:
+            return None
+        return rank // page_size + 1
+    
+    # Get library version (changes whenever tracks change)
+    def get_version(self):
+        return self.__version
+    
+    # Get cached sorted snapshot, rebuild only if library changed
+    def get_snapshot(self):
+        self.__ensure_tree()
+        if self.__snapshot_version != self.__version:
+            tracks = []
+            self.__inorder_traversal(tracks)
+            self.__snapshot = tuple(tracks)
+            self.__snapshot_version = self.__version
+        return self.__snapshot
+    
+    # Get all tracks in sorted order (immutable snapshot, do not copy)
+    def get_all_tracks(self):
+        return self.get_snapshot()
+    
+    # Get number of tracks in library - O(1) from root subtree size
+    def get_track_count(self):
+        if self.__base is not None:
+            return len(self.__base)
+        return self.__size(self.__root)
+    
+    # Get track table (column store of library tracks)
+    # Tracks still only in the base get their row on first use,
+    # the statistics below add them all first
+    def get_track_table(self):
+        return self.__columns
+    
+    # Give every base track a row (tree tracks already have one)
+    def __ensure_columns(self):
+        if self.__columns_complete or self.__base is None:
+            return
+        for track in self.__base:
+            self.__columns.row_for(track)
+        self.__columns_complete = True
+    
+    # Get total duration of library in seconds
+    def get_total_seconds(self):
+        self.__ensure_columns()
+        return self.__columns.total_seconds()
+    
+    # Get number of tracks per duration bucket: bucket start (seconds) -> count
+    def get_duration_histogram(self, bucket_seconds=60):
+        self.__ensure_columns()
+        return self.__columns.duration_histogram(bucket_seconds)
+    
+    # Get (track count, total seconds) per album name
+    def get_album_totals(self):
+        self.__ensure_columns()
+        return self.__columns.totals_by_album()
+    
+    # Get (track count, total seconds) per artist, every credited artist
+    # of a multi-artist track is counted
+    def get_artist_totals(self):
+        self.__ensure_columns()
+        return self.__columns.totals_by_artist()
+    
+    # Get tracks[start:stop] as a view over snapshot (no copy)
+    def get_tracks_slice(self, start, stop):
+        return TrackSlice(self.get_snapshot(), start, stop)
+    
     # Search for tracks by title (partial match)
+    # Uses trigram index, results come back in library sort order
     def search_by_title(self, search_term):
-        all_tracks = self.get_all_tracks()
+        self.__ensure_tree()
+        term = TrigramIndex.normalize(search_term)
+        if len(term) < TrigramIndex.GRAM_SIZE:
+            # Too short for the index, scan the already sorted snapshot
+            return [track for track in self.get_snapshot()
+                    if term in TrigramIndex.normalize(track.get_title())]
+        return self.__title_index.search(term)
+    
+    # Search by title, artist and album with query syntax, e.g.
+    #   artist:"Ava Rivers" album:morning golden
+    # Bare words match title words, quoted text must appear as a phrase
+    def search(self, query):
+        self.__ensure_tree()
+        return self.__field_index.search(parse_query(query))
+    
+    # Typo-tolerant search on titles and artists
+    # Returns top `limit` tracks ranked by edit distance
+    def fuzzy_search(self, search_term, limit=10):
+        self.__ensure_tree()
+        return self.__fuzzy_index.search(search_term, limit)
+    
+    # Search for tracks whose title start with prefix (for autocomplete)
+    # Seeks to the prefix in the tree and stops at first non-matching title,
+    # so cost is O(log n + k) for k results
+    def search_by_prefix(self, prefix, limit=10):
+        prefix_key = prefix.casefold()
         results = []
-        for track in all_tracks: # change to log(n) search if needed
-            if search_term.lower() in track.get_title().lower():
-                results.append(track)
+        if limit <= 0:
+            return results
+        
+        self.__ensure_tree()
+        for track in self.__iter_from_title(prefix_key):
+            if not track.get_sort_key()[0].startswith(prefix_key):
+                break  # Past the last title with this prefix
+            results.append(track)
+            if len(results) == limit:
+                break
         return results
     
     # Display all tracks with pagination
     def display_library(self, page=1):
-        tracks = self.get_all_tracks()
-        if not tracks:
+        total_tracks = self.get_track_count()
+        if not total_tracks:
             print("Library is empty!")
             return 0
         
         items_per_page = 10
-        total_pages = (len(tracks) + items_per_page - 1) // items_per_page
+        total_pages = (total_tracks + items_per_page - 1) // items_per_page
         
         start_idx = (page - 1) * items_per_page
-        end_idx = min(start_idx + items_per_page, len(tracks))
+        page_tracks = self.get_page(page, items_per_page)
         
         print("\n=== MUSIC LIBRARY ===")
-        for i in range(start_idx, end_idx):
-            print(f"[{i + 1}] {tracks[i].display()}")
+        for i, track in enumerate(page_tracks, start_idx + 1):
+            print(f"[{i}] {track.display()}")
         
         if total_pages > 1:
             print(f"\n<Page {page} of {total_pages}>")
@@ -147,99 +732,243 @@ class Library:
         
         return total_pages
     
-    # Save library to JSON file
-    def __save_to_file(self):
-        tracks = self.get_all_tracks()
-        data = [track.to_dict() for track in tracks]
-        
-        # Create data directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.__file_path), exist_ok=True)
-        
-        with open(self.__file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+    # Save library snapshot (binary file or JSON)
+    def __save_to_file(self, tracks=None):
+        if tracks is None:
+            tracks = self.get_all_tracks()
+        if self.__binary_path:
+            write_snapshot(self.__binary_path, tracks)
+            return
+        data = [dict(id=track.get_id(), **track.to_dict()) for track in tracks]
+        atomic_write_json(self.__file_path, data)
+    
+    # Path of the newest library snapshot, None if there is none
+    # Both files exist after switching SNAPSHOT_FORMAT (or to sqlite) and
+    # only the one written last has the tracks added since, the other one
+    # is left as it was. On a tie the configured format wins.
+    def __newest_snapshot(self):
+        newest = None
+        newest_time = None
+        paths = [self.__file_path, Config.BINARY_SNAPSHOT_PATH]
+        if self.__binary_path:
+            paths.reverse()
+        for path in paths:
+            if os.path.exists(path):
+                modified = os.stat(path).st_mtime_ns
+                if newest_time is None or modified > newest_time:
+                    newest, newest_time = path, modified
+        return newest
     
-    # Load library from JSON file
+    # Load library snapshot, then replay mutation log on top
     def __load_from_file(self):
-        if not os.path.exists(self.__file_path):
-            return
-        
+        migrate = False
         try:
-            with open(self.__file_path, 'r') as f:
-                data = json.load(f)
-                for track_data in data:
-                    track = Track.from_dict(track_data)
-                    inserted_flag = [False]
-                    self.__root = self.__insert_recursive(self.__root, track, inserted_flag)
+            snapshot_path = self.__newest_snapshot()
+            if snapshot_path == Config.BINARY_SNAPSHOT_PATH:
+                reader = SnapshotReader(snapshot_path)
+                if self.__binary_path:
+                    # Only the header is read, tracks load on demand and
+                    # logged tracks go into the overlay
+                    self.__base = SnapshotOverlay(reader)
+                else:
+                    # Binary snapshot is newer than library.json (binary
+                    # format used last), save its tracks in this format
+                    for track in reader:
+                        self.__insert(track)
+                    reader.close()
+                    migrate = True
+            else:
+                if os.path.exists(self.__file_path):
+                    with open(self.__file_path, 'r') as f:
+                        data = json.load(f)
+                        for track_data in data:
+                            track = Track.from_dict(track_data)
+                            track.set_id(track_data.get("id"))
+                            if track.get_id() is None:
+                                migrate = True  # Older file, save new ids
+                            self.__insert(track)
+                
+                # First run with binary snapshots: write library.bin
+                if self.__binary_path is not None and self.get_track_count() > 0:
+                    migrate = True
             
-            # Load albums after tracks are loaded
-            all_tracks = self.get_all_tracks()
-            self.__album_manager.load_from_file(all_tracks)
+            # Adds logged after the last snapshot (replay is idempotent,
+            # tracks already in the snapshot are just duplicates)
+            for record in self.__log.replay():
+                if record.get("op") == "add":
+                    track = Track.from_dict(record["track"])
+                    track.set_id(record.get("id"))
+                    if self.__insert_track(track):
+                        self.__add_to_album(track)
         except:
             print("Error loading library file")
+        
+        if (migrate and self.__store is None) or self.__log.get_count() >= COMPACT_THRESHOLD:
+            self.compact(background=True)
+    
+    # Load library and albums from SQLite store
+    def __load_from_store(self):
+        if self.__store.count_library_tracks() == 0:
+            # First run with sqlite backend: move existing JSON data over
+            self.__load_from_file()
+            with self.__store.transaction():
+                # Tracks keep their JSON ids as row ids, so ids saved in
+                # playlists and the queue still point at the same tracks
+                self.__track_table = {}
+                for track in self.get_snapshot():
+                    track.set_id(self.__store.add_library_track(track, track.get_id()))
+                    self.__register(track)
+                self.__album_manager.load_from_file(self.resolve_track)
+                self.__album_manager.save_to_store()
+                
+                # Tracks replayed from the library log join their albums
+                # after the saved ones (one album row each)
+                self.__albums_loaded = True
+                for track in self.__pending_album_tracks:
+                    self.__album_manager.add_track_to_album(track)
+                self.__pending_album_tracks = []
+            return
+        
+        # Counts, pages and lookups are read from the table, the tree
+        # and search indexes are built on first search or full listing.
+        # Albums are loaded from the store on first use
+        self.__base = self.__store.get_library_view()
     
     # Get track by index (for selection)
     def get_track_by_index(self, index):
-        tracks = self.get_all_tracks()
-        if 0 <= index < len(tracks):
-            return tracks[index]
-        return None
+        return self.select(index)
     
-    # Import tracks from JSON file
-    def import_from_json(self, file_path):
+    # Import tracks from JSON file (array of track objects)
+    # The file is streamed one track at a time, so memory stay flat for
+    # any file size and bad records are reported as they are reached
+    def import_from_json(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
         if not os.path.exists(file_path):
             return {"success": False, "error": "File not found!"}
         
+        return self.__import_chunks(iter_json_chunks(file_path, chunk_size),
+                                    ValueError, "Invalid JSON format!")
+    
+    # Import tracks from CSV file (streamed in chunks, flat memory)
+    # Needs a header row with title, artist, album and duration columns
+    def import_from_csv(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+        if not os.path.exists(file_path):
+            return {"success": False, "error": "File not found!"}
+        
+        return self.__import_chunks(iter_csv_chunks(file_path, chunk_size),
+                                    (ValueError, csv.Error), "Invalid CSV file:")
+    
+    # Insert (tracks, errors) chunks from a streaming reader and build the
+    # import result. file_errors are exceptions meaning the file itself is
+    # broken; tracks read before such an error stay imported.
+    def __import_chunks(self, chunks, file_errors, error_label):
+        imported = 0
+        skipped = 0
+        duplicates = 0
+        errors = []
+        
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            imported = 0
-            skipped = 0
-            duplicates = 0
-            errors = []
-            
-            for track_data in data:
-                try:
-                    # Validate required fields
-                    if not all(key in track_data for key in ['title', 'artist', 'album', 'duration']):
-                        errors.append(f"Missing required fields in track")
-                        skipped += 1
-                        continue
-                    
-                    # Handle multiple artists (comma separated in string)
-                    artist = track_data['artist']
-                    
-                    # Create track
-                    track = Track(
-                        track_data['title'],
-                        artist,
-                        track_data['album'],
-                        track_data['duration']
-                    )
-                    
-                    # Add to library (returns False if duplicate)
-                    was_added = self.add_track(track)
-                    if was_added:
-                        imported += 1
-                    else:
-                        duplicates += 1
-                    
-                except Exception as e:
-                    errors.append(f"Error with track: {str(e)}")
-                    skipped += 1
-            
-            return {
-                "success": True,
-                "imported": imported,
-                "duplicates": duplicates,
-                "skipped": skipped,
-                "errors": errors
-            }
-            
-        except json.JSONDecodeError:
-            return {"success": False, "error": "Invalid JSON format!"}
+            # Each chunk goes through the batched insert path, files are
+            # written once when the outer transaction ends
+            with self.transaction():
+                for tracks, chunk_errors in chunks:
+                    added = self.add_tracks(tracks)
+                    imported += added
+                    duplicates += len(tracks) - added
+                    skipped += len(chunk_errors)
+                    errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+        except file_errors as e:
+            error = f"{error_label} {str(e)}"
+            if imported:
+                error += f" ({imported} track(s) before the error were imported)"
+            return {"success": False, "error": error}
         except Exception as e:
             return {"success": False, "error": f"Error reading file: {str(e)}"}
+        
+        return {
+            "success": True,
+            "imported": imported,
+            "duplicates": duplicates,
+            "skipped": skipped,
+            "errors": errors
+        }
+    
+    # Import every JSON and CSV file in a directory
+    # Files are parsed and validated in parallel worker processes, then
+    # merged into the library in file order in one transaction (library
+    # and album files written once). Returns one combined report.
+    # With incremental=True the import manifest (data/track_imports.json)
+    # skips files unchanged since the last import and reads only the
+    # appended rows of CSV files.
+    def import_directory(self, directory, workers=None, incremental=True):
+        if not os.path.isdir(directory):
+            return {"success": False, "error": "Directory not found!"}
+        all_paths = list_import_files(directory)
+        if not all_paths:
+            return {"success": False, "error": "No JSON or CSV files found!"}
+        if workers is None:
+            workers = Config.IMPORT_WORKERS
+        
+        manifest = ImportManifest("data/track_imports.json")
+        file_paths = []
+        offsets = []
+        first_lines = []
+        entries = {}  # File path -> manifest entry to record after import
+        for file_path in all_paths:
+            try:
+                change = manifest.check(file_path)
+            except OSError:
+                change = (0, 1, None)  # Let the parser report the error
+            if change is None:
+                if incremental:
+                    continue  # Unchanged since last import
+                change = (0, 1, None)
+            offset, first_line, entry = change
+            file_paths.append(file_path)
+            offsets.append(offset if incremental else 0)
+            first_lines.append(first_line if incremental else 1)
+            if entry:
+                entries[file_path] = entry
+        
+        imported = 0
+        skipped = 0
+        duplicates = 0
+        errors = []
+        failed_files = []  # Files that could not be read (fully)
+        done = []  # Files read without error, recorded once committed
+        
+        try:
+            with self.transaction():
+                for result in iter_parsed_files(file_paths, workers, offsets, first_lines):
+                    name = os.path.basename(result["file"])
+                    rows = result["rows"]
+                    added = self.add_tracks(Track(*row) for row in rows)
+                    imported += added
+                    duplicates += result["duplicates"] + len(rows) - added
+                    skipped += result["skipped"]
+                    for error in result["errors"][:MAX_REPORTED_ERRORS - len(errors)]:
+                        errors.append(f"{name}: {error}")
+                    if result["file_error"]:
+                        # Not recorded, so the file is read again next time
+                        failed_files.append(f"{name}: {result['file_error']}")
+                    elif result["file"] in entries:
+                        done.append(result["file"])
+            for file_path in done:
+                manifest.record(file_path, entries[file_path])
+        except Exception as e:
+            return {"success": False, "error": f"Error importing directory: {str(e)}"}
+        finally:
+            manifest.save()
+        
+        return {
+            "success": True,
+            "files": len(file_paths),
+            "unchanged": len(all_paths) - len(file_paths),
+            "imported": imported,
+            "duplicates": duplicates,
+            "skipped": skipped,
+            "errors": errors,
+            "failed_files": failed_files
+        }
     
     # Import tracks (auto-detect format)
     def import_tracks(self, file_path):
@@ -1,7 +1,11 @@
+import time
+START_TIME = time.perf_counter()  # For startup timing report
+
+import Config
 from Library import Library
 from Playlist import PlaylistManager
 from Queue import MusicQueue
-from Track import Track
+from Track import Track, parse_duration
 
 def main_menu():
     print("\n" + "="*40)
@@ -20,7 +24,8 @@ def library_menu():
     print("[3] Search Track")
     print("[4] View Albums")
     print("[5] Import Tracks")
-    print("[6] Back")
+    print("[6] View Artist")
+    print("[7] Back")
 
 def playlist_menu():
     print("\n--- PLAYLISTS ---")
@@ -59,12 +64,49 @@ def queue_menu(is_playing, is_repeat, is_shuffled):
     print("[7] Clear queue")
     print("[8] Exit queue")
 
-# Initialize components
-library = Library()
-playlist_manager = PlaylistManager(library)
-music_queue = MusicQueue()
+# Components are created on first use, so the main menu shows right away
+# and only the parts the user opens are loaded from disk
+library = None
+playlist_manager = None
+music_queue = None
+
+# Print how long a startup step took (enabled with LTTM_TIMING=1)
+def report_timing(label, start):
+    if Config.SHOW_TIMINGS:
+        print(f"[timing] {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def get_library():
+    global library
+    if library is None:
+        start = time.perf_counter()
+        library = Library()
+        report_timing("Library loaded", start)
+    return library
+
+def get_playlist_manager():
+    global playlist_manager
+    if playlist_manager is None:
+        library = get_library()  # Imported playlist tracks go to library
+        start = time.perf_counter()
+        playlist_manager = PlaylistManager(library)
+        report_timing("Playlists loaded", start)
+    return playlist_manager
+
+def get_music_queue():
+    global music_queue
+    if music_queue is None:
+        start = time.perf_counter()
+        # Saved queue holds library track ids, library loads when the
+        # queue first resolves one
+        music_queue = MusicQueue(get_library)
+        report_timing("Queue ready", start)
+    return music_queue
 
 def handle_library():
+    library = get_library()
+    music_queue = get_music_queue()
+    start_page = 1  # Page "View Library" opens on (jumps to last added track)
+    
     while True:
         library_menu()
         choice = input("Enter choice: ")
@@ -82,18 +124,23 @@ def handle_library():
                 artist = artist_input.strip()
             
             album = input("Album: ")
-            duration = input("Duration (mm:ss): ")
-            if ":" not in duration or len(duration.split(":")) != 2:
-                print("Invalid duration format! Use mm:ss")
+            duration = input("Duration (mm:ss or h:mm:ss): ")
+            if parse_duration(duration) is None:
+                print("Invalid duration format! Use mm:ss or h:mm:ss")
                 continue
             
             track = Track(title, artist, album, duration)
-            library.add_track(track)
-            print("Track added successfully!")
+            if library.add_track(track):
+                print("Track added successfully!")
+            else:
+                print("Track already exists in library!")
+            start_page = library.get_page_of(track)
+            print(f"Track is on page {start_page} of the library.")
         
         elif choice == "2":
             # View library with pagination
-            page = 1
+            page = start_page
+            start_page = 1
             while True:
                 total_pages = library.display_library(page)
                 if not total_pages:
@@ -146,8 +193,25 @@ def handle_library():
         
         elif choice == "3":
             # Search track
-            search_term = input("Enter track title to search: ")
-            results = library.search_by_title(search_term)
+            print("Search by title, or use fields like: artist:\"Ava Rivers\" album:morning golden")
+            search_term = input("Enter search (end with * to autocomplete): ")
+            
+            if search_term.endswith("*"):
+                # Type-ahead: suggest titles starting with what was typed
+                suggestions = library.search_by_prefix(search_term[:-1], 10)
+                if suggestions:
+                    print("\n--- Suggestions ---")
+                    for i, track in enumerate(suggestions, 1):
+                        print(f"[{i}] {track.display()}")
+                else:
+                    print("No suggestions found!")
+                continue
+            
+            if ":" in search_term:
+                # Multi-field query (artist:, album:, title:)
+                results = library.search(search_term)
+            else:
+                results = library.search_by_title(search_term)
             
             if results:
                 print("\n--- Search Results ---")
@@ -155,6 +219,12 @@ def handle_library():
                     print(f"[{i}] {track.display()}")
             else:
                 print("No tracks found!")
+                # Maybe a typo, suggest closest titles/artists
+                suggestions = library.fuzzy_search(search_term, 5)
+                if suggestions:
+                    print("\n--- Did you mean? ---")
+                    for i, track in enumerate(suggestions, 1):
+                        print(f"[{i}] {track.display()}")
         
         elif choice == "4":
             # View albums
@@ -224,15 +294,24 @@ def handle_library():
             # Import tracks
             print("\n--- Import Tracks ---")
             print("Place your JSON or CSV files in the 'import/tracks' directory")
-            file_name = input("Enter filename (e.g., tracks1.json): ")
+            file_name = input("Enter filename (e.g., tracks1.json), or leave empty to import new and changed files: ")
             
-            # Construct file path
-            file_path = f"import/tracks/{file_name}"
-            
-            print(f"\nImporting from {file_path}...")
-            result = library.import_tracks(file_path)
+            if file_name.strip():
+                # Construct file path
+                file_path = f"import/tracks/{file_name}"
+                
+                print(f"\nImporting from {file_path}...")
+                result = library.import_tracks(file_path)
+            else:
+                # New and changed files in the folder, parsed in parallel
+                print("\nImporting new and changed files from import/tracks...")
+                result = library.import_directory("import/tracks")
             
             if result["success"]:
+                if "files" in result:
+                    print(f"\n✓ Read {result['files']} file(s), {result['unchanged']} unchanged file(s) skipped")
+                    for failed in result["failed_files"]:
+                        print(f"⚠ Could not fully read {failed}")
                 print(f"\n✓ Successfully imported {result['imported']} tracks!")
                 
                 # Show duplicates
@@ -257,9 +336,40 @@ def handle_library():
             input("\nPress Enter to continue...")
         
         elif choice == "6":
+            # View artist (tracks credited to them, on any album)
+            name = input("Artist name: ")
+            artists = library.get_artist_registry()
+            tracks = artists.get_tracks(name)
+            if not tracks:
+                print("No tracks found for this artist!")
+                continue
+            
+            track_count, album_count, total_seconds = artists.get_stats(name)
+            print(f"\n=== Artist: {artists.get_name(artists.get_id(name))} ===")
+            print(f"Tracks: {track_count}  |  Albums: {album_count}  |  "
+                  f"Total Duration: {total_seconds // 60} min {total_seconds % 60} sec")
+            print("Albums: " + ", ".join(artists.get_albums(name)))
+            print("Tracks:")
+            for i, track in enumerate(tracks, 1):
+                print(f"    [{i}] {track.display()}")
+            
+            # Show artist options
+            print("[q] Queue  |  [b] Back")
+            action = input("Enter choice: ")
+            if action.lower() == 'q':
+                music_queue.clear()
+                music_queue.load_tracks(tracks)
+                print(f"Queue created from artist '{artists.get_name(artists.get_id(name))}'!")
+                input("Press Enter to continue...")
+        
+        elif choice == "7":
             break
 
 def handle_playlists():
+    library = get_library()
+    playlist_manager = get_playlist_manager()
+    music_queue = get_music_queue()
+    
     while True:
         playlist_menu()
         choice = input("Enter choice: ")
@@ -519,15 +629,23 @@ def handle_playlists():
             # Import playlists
             print("\n--- Import Playlists ---")
             print("Place your JSON or CSV files in the 'import/playlists' directory")
-            file_name = input("Enter filename (e.g., playlist1.json): ")
-            
-            # Construct file path
-            file_path = f"import/playlists/{file_name}"
+            file_name = input("Enter filename (e.g., playlist1.json), or leave empty to import new and changed files: ")
             
-            print(f"\nImporting from {file_path}...")
-            result = playlist_manager.import_playlists(file_path)
+            if file_name.strip():
+                # Construct file path
+                file_path = f"import/playlists/{file_name}"
+                
+                print(f"\nImporting from {file_path}...")
+                result = playlist_manager.import_playlists(file_path)
+            else:
+                print("\nImporting new and changed files from import/playlists...")
+                result = playlist_manager.import_directory("import/playlists")
             
             if result["success"]:
+                if "files" in result:
+                    print(f"\n✓ Read {result['files']} file(s), {result['unchanged']} unchanged file(s) skipped")
+                    for failed in result["failed_files"]:
+                        print(f"⚠ Could not read {failed}")
                 print(f"\n✓ Successfully imported {result['imported']} playlist(s)!")
                 print("✓ All tracks from playlists have been added to your library!")
                 
@@ -551,6 +669,8 @@ def handle_playlists():
             break
 
 def handle_queue():
+    music_queue = get_music_queue()
+    
     # Try to load previous queue state
     music_queue.load_state()
     
@@ -658,6 +778,7 @@ def handle_queue():
 
 def main():
     print("Welcome to Listen to the Music!")
+    report_timing("First menu", START_TIME)
     
     while True:
         main_menu()
@@ -670,6 +791,10 @@ def main():
         elif choice == "3":
             handle_queue()
         elif choice == "4":
+            if library is not None:
+                library.close()  # Flush pending library changes to disk
+            if music_queue is not None:
+                music_queue.flush_state()  # Write debounced queue state now
             print("Thanks for using Listen to the Music!")
             break
         else:
@@ -0,0 +1,113 @@
+import json
+import os
+
+class MutationLog:
+    """
+    Append-only log of changes (write-ahead log) for a data file.
+
+    Each change is written as one compact JSON line, so saving a change
+    cost O(1) I/O instead of rewriting the whole data file. Lines are
+    flushed to the OS on every append and fsync'd in batches of
+    sync_every records (or on sync/close).
+
+    On compaction the current log is rotated to a ".old" file while the
+    owner writes a new snapshot; after the snapshot is safely written
+    the old log is deleted. Startup replays the old log (if compaction
+    was interrupted) and then the current log, so replay must be
+    idempotent.
+
+    Attributes:
+        __file_path: Path to the current log file
+        __old_path: Path of log being folded into a snapshot
+        __sync_every: Number of appends between fsync calls
+        __file: Open log file (opened on first append)
+        __unsynced: Appends since last fsync
+        __count: Records in current log (replayed + appended)
+    """
+    def __init__(self, file_path, sync_every=32):
+        self.__file_path = file_path
+        self.__old_path = file_path + ".old"
+        self.__sync_every = sync_every
+        self.__file = None
+        self.__unsynced = 0
+        self.__count = 0
+
+    # Get number of records waiting to be compacted
+    def get_count(self):
+        return self.__count
+
+    # Append one record (dict) to the log
+    def append(self, record):
+        if self.__file is None:
+            os.makedirs(os.path.dirname(self.__file_path) or ".", exist_ok=True)
+            self.__file = open(self.__file_path, 'a')
+
+        self.__file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self.__file.flush()
+        self.__count += 1
+        self.__unsynced += 1
+        if self.__unsynced >= self.__sync_every:
+            self.sync()
+
+    # Force appended records to disk
+    def sync(self):
+        if self.__file and self.__unsynced:
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+        self.__unsynced = 0
+
+    # Sync and close log file
+    def close(self):
+        self.sync()
+        if self.__file:
+            self.__file.close()
+            self.__file = None
+
+    # Read records of one log file, stop at a torn last line (crash)
+    # The torn tail is cut off so new appends start on a clean line
+    def __read(self, path):
+        if not os.path.exists(path):
+            return
+        good_offset = 0
+        torn = False
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Unfinished record")
+                    record = json.loads(line)
+                except ValueError:
+                    torn = True  # Half-written record from a crash
+                    break
+                good_offset += len(line)
+                yield record
+        if torn:
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+
+    # Replay all records not yet folded into a snapshot (oldest first)
+    def replay(self):
+        self.__count = 0
+        for path in (self.__old_path, self.__file_path):
+            for record in self.__read(path):
+                self.__count += 1
+                yield record
+
+    # Start compaction: move current records aside, new appends go to
+    # a fresh log. Call finish_compaction once the snapshot is written.
+    def begin_compaction(self):
+        self.close()
+        if os.path.exists(self.__file_path):
+            if os.path.exists(self.__old_path):
+                # Earlier compaction did not finish, keep its records too
+                with open(self.__old_path, 'a') as old, open(self.__file_path, 'r') as current:
+                    old.write(current.read())
+                os.remove(self.__file_path)
+            else:
+                os.replace(self.__file_path, self.__old_path)
+        self.__count = 0
+
+    # Snapshot written: records in the old log are no longer needed
+    def finish_compaction(self):
+        if os.path.exists(self.__old_path):
+            os.remove(self.__old_path)
@@ -1,7 +1,14 @@
 ﻿import json
 import os
+from array import array
+from contextlib import nullcontext
 from datetime import datetime
 from Track import Track
+from Storage import atomic_write_json
+from Importer import iter_json_array
+from SearchIndex import normalize_text
+from ImportManifest import ImportManifest
+from SQLiteStore import get_store
 
 #linked list node for playlist tracks
 class PlaylistNode:
@@ -13,12 +20,16 @@ class PlaylistNode:
 
 class Playlist:
     #Represent a playlist with tracks in linked list.
-    def __init__(self, name, created_at=None):
+    def __init__(self, name, created_at=None, track_table=None):
         self.__name = name
         self.__head: PlaylistNode = None  # Linked list of tracks
-        self.__track_set = set()  # Hash set for duplicate checking (stores titles)
+        self.__tail: PlaylistNode = None  # Last node, for constant-time append
+        self.__track_set = set()  # Hash set for duplicate checking (title + artist keys)
         self.__size = 0
         self.__created_at = created_at if created_at else datetime.now()
+        self.__track_table = track_table  # Library's TrackTable, or None
+        self.__rows = array('I')  # Track table rows of library tracks
+        self.__other_seconds = 0  # Seconds of tracks without a table row
     
     # Getters
     def get_name(self):
@@ -30,32 +41,43 @@ class Playlist:
     def get_created_at(self):
         return self.__created_at
     
-    # Check if track already exists in playlist
-    def __has_track(self, track):
-        # Simple duplicate check using title + artist
-        track_id = track.get_title().lower() + str(track.get_artist()).lower()
-        return track_id in self.__track_set
+    # Duplicate key of track: a playlist holds one track per title + artists
+    # (case and whitespace-insensitive), whatever album it is from
+    @staticmethod
+    def __duplicate_key(track):
+        return (track.get_sort_key()[0],
+                tuple(normalize_text(name) for name in track.get_artists()))
+    
+    # Check if track already exists in playlist (hash lookup)
+    def has_track(self, track):
+        return self.__duplicate_key(track) in self.__track_set
     
     # Add track to playlist
-    def add_track(self, track):
-        if self.__has_track(track):
+    def add_track(self, track, added_at=None):
+        if self.has_track(track):
             return False  # Track already exists
         
-        new_node = PlaylistNode(track)
-        track_id = track.get_title().lower() + str(track.get_artist()).lower()
-        self.__track_set.add(track_id)
-        
-        # Add to end of linked list
+        self.__append_entry(track, added_at)
+        return True
+    
+    # Append track without duplicate check (used when loading saved entries)
+    def __append_entry(self, track, added_at):
+        self.__track_set.add(self.__duplicate_key(track))
+        self.__append_node(PlaylistNode(track, added_at))
+        self.__size += 1
+        row = self.__track_table.row_for(track) if self.__track_table else None
+        if row is None:
+            self.__other_seconds += track.duration_to_seconds()
+        else:
+            self.__rows.append(row)
+    
+    # Add node to end of linked list
+    def __append_node(self, node):
         if self.__head is None:
-            self.__head = new_node
+            self.__head = node
         else:
-            current = self.__head
-            while current.next:
-                current = current.next
-            current.next = new_node
-        
-        self.__size += 1
-        return True
+            self.__tail.next = node
+        self.__tail = node
     
     # Get all tracks as a list
     def get_tracks(self):
@@ -66,13 +88,24 @@ class Playlist:
             current = current.next
         return tracks
     
-    # Calculate total duration
-    def get_total_duration(self):
-        total_seconds = 0
+    # Get all (track, added_at) pairs as a list
+    def get_entries(self):
+        entries = []
         current = self.__head
         while current:
-            total_seconds += current.track.duration_to_seconds()
+            entries.append((current.track, current.added_at))
             current = current.next
+        return entries
+    
+    # Get total seconds of playlist (summed over track table column)
+    def get_total_seconds(self):
+        if self.__track_table is None:
+            return self.__other_seconds
+        return self.__track_table.total_seconds(self.__rows) + self.__other_seconds
+    
+    # Calculate total duration
+    def get_total_duration(self):
+        total_seconds = self.get_total_seconds()
         
         # Convert back to readable format
         hours = total_seconds // 3600
@@ -111,64 +144,36 @@ class Playlist:
             current = current.next
         
         # Define sorting key with tie-breaker hierarchy
+        # Track sort key is (title, main artist, album, seconds), precomputed
         def sort_key(item):
             track, added_at = item
+            title, artist, album, seconds = track.get_sort_key()
             
             if criteria == "date_added":
-                return (
-                    added_at,
-                    track.get_title().lower(),
-                    track.get_main_artist().lower(),
-                    track.get_album().lower(),
-                    track.duration_to_seconds()
-                )
+                return (added_at, title, artist, album, seconds)
             elif criteria == "title":
-                return (
-                    track.get_title().lower(),
-                    track.get_main_artist().lower(),
-                    track.get_album().lower(),
-                    track.duration_to_seconds(),
-                    added_at
-                )
+                return (title, artist, album, seconds, added_at)
             elif criteria == "artist":
-                return (
-                    track.get_main_artist().lower(),
-                    track.get_title().lower(),
-                    track.get_album().lower(),
-                    track.duration_to_seconds(),
-                    added_at
-                )
+                return (artist, title, album, seconds, added_at)
             elif criteria == "duration":
-                return (
-                    track.duration_to_seconds(),
-                    track.get_title().lower(),
-                    track.get_main_artist().lower(),
-                    track.get_album().lower(),
-                    added_at
-                )
+                return (seconds, title, artist, album, added_at)
         
         # Sort the array
         tracks_with_dates.sort(key=sort_key)
         
         # Rebuild linked list with sorted order
         self.__head = None
+        self.__tail = None
         for track, added_at in tracks_with_dates:
-            new_node = PlaylistNode(track, added_at)
-            if self.__head is None:
-                self.__head = new_node
-            else:
-                current = self.__head
-                while current.next:
-                    current = current.next
-                current.next = new_node
-    
-    # Convert to dictionary for saving
+            self.__append_node(PlaylistNode(track, added_at))
+    
+    # Convert to dictionary for saving (tracks saved as library track ids)
     def to_dict(self):
         tracks_data = []
         current = self.__head
         while current:
             tracks_data.append({
-                "track": current.track.to_dict(),
+                "track": current.track.to_ref(),
                 "added_at": current.added_at.isoformat()
             })
             current = current.next
@@ -180,29 +185,20 @@ class Playlist:
         }
     
     # Create playlist from dictionary
+    # resolve(ref) gets the track for a saved track id or track dict
     @staticmethod
-    def from_dict(data):
+    def from_dict(data, resolve, track_table=None):
         created_at = datetime.fromisoformat(data["created_at"])
-        playlist = Playlist(data["name"], created_at)
+        playlist = Playlist(data["name"], created_at, track_table)
         
         for track_item in data["tracks"]:
-            track = Track.from_dict(track_item["track"])
+            track = resolve(track_item["track"])
+            if track is None:
+                continue  # Track id no longer in library
             added_at = datetime.fromisoformat(track_item["added_at"])
             
             # Manually add to maintain timestamp
-            new_node = PlaylistNode(track, added_at)
-            track_id = track.get_title().lower() + str(track.get_artist()).lower()
-            playlist._Playlist__track_set.add(track_id)
-            
-            if playlist._Playlist__head is None:
-                playlist._Playlist__head = new_node
-            else:
-                current = playlist._Playlist__head
-                while current.next:
-                    current = current.next
-                current.next = new_node
-            
-            playlist._Playlist__size += 1
+            playlist.__append_entry(track, added_at)
         
         return playlist
     
@@ -212,16 +208,37 @@ class PlaylistManager:
         self.__playlists = {}  # Hash map: name -> Playlist
         self.__file_path = "data/playlists.json"
         self.__library = library  # Reference to Library for auto-adding tracks
-        self.__load_from_file()
+        # Library's column store, playlist totals are summed over it
+        self.__track_table = library.get_track_table() if library else None
+        self.__store = get_store()  # SQLite store, or None for JSON file
+        if self.__store:
+            self.__load_from_store()
+        else:
+            self.__load_from_file()
+    
+    # Get track for a saved reference (library track id or track dict)
+    # Store ids that are not library tracks are read from their row
+    def __resolve(self, ref):
+        if self.__library:
+            track = self.__library.resolve_track(ref)
+        else:
+            track = Track.from_dict(ref) if isinstance(ref, dict) else None
+        if track is None and self.__store and not isinstance(ref, dict):
+            row = self.__store.get_track(ref)
+            track = row[1] if row else None
+        return track
     
     # Create new playlist
     def create_playlist(self, name):
         if name in self.__playlists:
             return None  # Playlist name already exists
         
-        playlist = Playlist(name)
+        playlist = Playlist(name, track_table=self.__track_table)
         self.__playlists[name] = playlist
-        self.__save_to_file()
+        if self.__store:
+            self.__store.add_playlist(name, playlist.get_created_at())
+        else:
+            self.__save_to_file()
         return playlist
     
     # Get playlist by name
@@ -245,13 +262,8 @@ class PlaylistManager:
         elif criteria == "name":
             playlists.sort(key=lambda p: p.get_name().lower())
         elif criteria == "duration":
-            # Sort by total seconds (calculate duration for each)
-            def get_duration_seconds(playlist):
-                total = 0
-                for track in playlist.get_tracks():
-                    total += track.duration_to_seconds()
-                return total
-            playlists.sort(key=get_duration_seconds)
+            # Sort by total seconds (kept per playlist, no track walk)
+            playlists.sort(key=lambda p: p.get_total_seconds())
         
         return playlists
     
@@ -297,9 +309,13 @@ class PlaylistManager:
     def add_track_to_playlist(self, playlist_name, track):
         playlist = self.get_playlist(playlist_name)
         if playlist:
-            result = playlist.add_track(track)
+            added_at = datetime.now()
+            result = playlist.add_track(track, added_at)
             if result:
-                self.__save_to_file()
+                if self.__store:
+                    self.__store.add_playlist_entry(playlist_name, track, added_at)
+                else:
+                    self.__save_to_file()
             return result
         return False
     
@@ -309,10 +325,7 @@ class PlaylistManager:
         for playlist in self.__playlists.values():
             data.append(playlist.to_dict())
         
-        os.makedirs(os.path.dirname(self.__file_path), exist_ok=True)
-        
-        with open(self.__file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        atomic_write_json(self.__file_path, data)
     
     # Load playlists from file
     def __load_from_file(self):
@@ -323,23 +336,47 @@ class PlaylistManager:
             with open(self.__file_path, 'r') as f:
                 data = json.load(f)
                 for playlist_data in data:
-                    playlist = Playlist.from_dict(playlist_data)
+                    playlist = Playlist.from_dict(playlist_data, self.__resolve, self.__track_table)
                     self.__playlists[playlist.get_name()] = playlist
         except:
             print("Error loading playlists file")
     
-    # Import playlists from JSON file
+    # Load playlists from SQLite store
+    def __load_from_store(self):
+        if not self.__store.has_playlists():
+            # First run with sqlite backend: move existing JSON data over
+            self.__load_from_file()
+            with self.__store.transaction():
+                for playlist in self.__playlists.values():
+                    self.__save_playlist_to_store(playlist)
+            return
+        
+        for playlist_data in self.__store.load_playlists():
+            playlist = Playlist.from_dict(playlist_data, self.__resolve, self.__track_table)
+            self.__playlists[playlist.get_name()] = playlist
+    
+    # Write one whole playlist into SQLite store
+    def __save_playlist_to_store(self, playlist):
+        name = playlist.get_name()
+        self.__store.add_playlist(name, playlist.get_created_at())
+        for track, added_at in playlist.get_entries():
+            self.__store.add_playlist_entry(name, track, added_at)
+    
+    # Import playlists from JSON file (array of playlist objects)
+    # Playlists are streamed one at a time, so the whole file is never
+    # loaded into memory
     def import_from_json(self, file_path):
+        imported = 0
+        duplicates = 0
+        skipped = 0
+        errors = []
+        
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                
-                imported = 0
-                duplicates = 0
-                skipped = 0
-                errors = []
-                
-                for playlist_data in data:
+            # One library transaction for all tracks, so library and
+            # albums files are written once instead of once per track
+            library_transaction = self.__library.transaction() if self.__library else nullcontext()
+            with library_transaction:
+                for playlist_data in iter_json_array(file_path):
                     try:
                         name = playlist_data["name"]
                         
@@ -348,38 +385,90 @@ class PlaylistManager:
                             duplicates += 1
                             continue
                         
-                        # Create new playlist
-                        playlist = self.create_playlist(name)
-                        if not playlist:
-                            skipped += 1
-                            continue
+                        # Create new playlist (saved once after the loop)
+                        playlist = Playlist(name, track_table=self.__track_table)
+                        self.__playlists[name] = playlist
                         
                         # Add tracks to playlist
                         for track_data in playlist_data["tracks"]:
                             track = Track.from_dict(track_data)
-                            playlist.add_track(track)
                             # Automatically add track to library if library reference exists
+                            # (playlist keeps the library's track, so it is saved by id)
                             if self.__library:
                                 self.__library.add_track(track)
+                                track = self.__library.find_track(track)
+                            playlist.add_track(track)
                         
+                        if self.__store:
+                            self.__save_playlist_to_store(playlist)
                         imported += 1
                         
                     except Exception as e:
                         errors.append(f"Error with playlist: {str(e)}")
                         skipped += 1
-                
-                self.__save_to_file()
-                
-                return {
-                    "success": True,
-                    "imported": imported,
-                    "duplicates": duplicates,
-                    "skipped": skipped,
-                    "errors": errors
-                }
-                
+            
+            result = {
+                "success": True,
+                "imported": imported,
+                "duplicates": duplicates,
+                "skipped": skipped,
+                "errors": errors
+            }
+        except ValueError as e:
+            error = f"Invalid JSON format! {str(e)}"
+            if imported:
+                error += f" ({imported} playlist(s) before the error were imported)"
+            result = {"success": False, "error": error}
         except Exception as e:
-            return {"success": False, "error": f"Error reading file: {str(e)}"}
+            result = {"success": False, "error": f"Error reading file: {str(e)}"}
+        
+        # Playlists imported before an error are kept too
+        if imported and not self.__store:
+            self.__save_to_file()
+        return result
+    
+    # Import every JSON file in a directory, one combined report
+    # With incremental=True the import manifest (data/playlist_imports.json)
+    # skips files unchanged since the last import
+    def import_directory(self, directory, incremental=True):
+        if not os.path.isdir(directory):
+            return {"success": False, "error": "Directory not found!"}
+        file_paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(".json"))
+        if not file_paths:
+            return {"success": False, "error": "No JSON files found!"}
+        
+        manifest = ImportManifest("data/playlist_imports.json")
+        report = {"success": True, "files": 0, "unchanged": 0, "imported": 0,
+                  "duplicates": 0, "skipped": 0, "errors": [], "failed_files": []}
+        
+        # Library files are written once for all playlist files
+        library_transaction = self.__library.transaction() if self.__library else nullcontext()
+        try:
+            with library_transaction:
+                for file_path in file_paths:
+                    try:
+                        change = manifest.check(file_path)
+                    except OSError:
+                        change = (0, 1, None)  # Import reports the error
+                    if change is None and incremental:
+                        report["unchanged"] += 1
+                        continue
+                    
+                    report["files"] += 1
+                    name = os.path.basename(file_path)
+                    result = self.import_from_json(file_path)
+                    if not result["success"]:
+                        report["failed_files"].append(f"{name}: {result['error']}")
+                        continue
+                    for key in ("imported", "duplicates", "skipped"):
+                        report[key] += result[key]
+                    report["errors"].extend(f"{name}: {error}" for error in result["errors"])
+                    if change is not None and change[2]:
+                        manifest.record(file_path, change[2])
+        finally:
+            manifest.save()
+        return report
     
     # Import playlists (auto-detect format) 
     def import_playlists(self, file_path):
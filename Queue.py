@@ -1,7 +1,29 @@
+import atexit
 import json
 import os
 import random
+import threading
+import time
+import weakref
 from Track import Track
+from SQLiteStore import get_store
+from Storage import atomic_write_json
+
+# Seconds without changes before pending queue state is written
+SAVE_DELAY = 0.5
+
+# Queues whose pending state is written at exit (weak, so a dropped queue
+# can still be freed)
+_open_queues = weakref.WeakSet()
+
+
+# Write pending state of every open queue (registered once with atexit)
+def _flush_open_queues():
+    for queue in list(_open_queues):
+        queue.flush_state()
+
+
+atexit.register(_flush_open_queues)
 
 # Doubly linked list node for queue
 class QueueNode:
@@ -21,7 +43,22 @@ class QueueNode:
         self.prev: Track = None
 
 class MusicQueue:
-    def __init__(self):
+    """
+    Music queue stored in a doubly linked list.
+    
+    Saving is debounced: save_state only remember the latest state and
+    it is written once the queue has been idle for SAVE_DELAY seconds
+    (or on flush_state / exit), so a burst of changes cost one write.
+    One timer runs per idle window: later calls only move its deadline.
+    The JSON file is replaced atomically, so a crash never leave it
+    half-written. Tracks are saved as library track ids and loaded back
+    through the library, so the queue share the library's track objects.
+    The library can be given as a function returning it, then it is only
+    loaded once a saved track id has to be resolved (an empty saved
+    queue never loads it).
+    """
+    def __init__(self, library=None):
+        self.__library = library  # Resolves saved track ids to tracks
         self.__head = None
         self.__tail = None
         self.__current = None  # Currently playing track
@@ -29,17 +66,24 @@ class MusicQueue:
         self.__is_shuffled = False
         self.__is_repeat = False
         self.__is_playing = False
-        self.__original_order = []  # For unshuffling
+        self.__track_set = set()  # Hash set of queued tracks for duplicate checking
+        # For unshuffling: insertion-ordered dict used as ordered set
+        # (track -> None), so membership checks and removals are constant time
+        self.__original_order = {}
         self.__file_path = "data/queue_state.json"
+        self.__store = get_store()  # SQLite store, or None for JSON file
+        self.__pending_state = None  # Latest unsaved state (tuple snapshot)
+        self.__save_timer = None  # Timer that writes pending state
+        self.__save_deadline = 0  # time.monotonic() when state is written
+        self.__save_lock = threading.Lock()
+        _open_queues.add(self)  # Never lose pending changes on exit
     
     # Add track to queue
     def add_track(self, track: Track):
-        curr = self.__head
-        while curr is not None:
-            if curr.track == track:
-                print(f"Track '{track.get_title()}' by '{track.get_artist()}' is already in the queue. Skipping addition.")
-                return False  # Duplicate found
-            curr = curr.next
+        if track in self.__track_set:
+            print(f"Track '{track.get_title()}' by '{track.get_artist()}' is already in the queue. Skipping addition.")
+            return False  # Duplicate found
+        self.__track_set.add(track)
 
         new_node = QueueNode(track)
         
@@ -56,7 +100,7 @@ class MusicQueue:
         # Only add to original_order if not shuffled
         # If shuffled, newly added tracks stay at end and won't be in original order
         if not self.__is_shuffled:
-            self.__original_order.append(track)
+            self.__original_order[track] = None
         return True  # Successfully added
     
     # Load tracks from a list (for creating queue from playlist/library)
@@ -119,7 +163,7 @@ class MusicQueue:
         if len(self.__original_order) == 0:
             current = self.__head
             while current:
-                self.__original_order.append(current.track)
+                self.__original_order[current.track] = None
                 current = current.next
         
         # Split tracks into: before current, current, and after current
@@ -239,7 +283,7 @@ class MusicQueue:
                 new_node.prev = self.__tail
                 self.__tail = new_node
             self.__size += 1
-            self.__original_order.append(track)  # Add to original order now
+            self.__original_order[track] = None  # Add to original order now
         
         # Find and set current track
         self.__current = None  # Reset first
@@ -307,9 +351,10 @@ class MusicQueue:
         
         self.__size -= 1
         
+        self.__track_set.discard(track_to_remove)
+        
         # Remove from original_order if present
-        if track_to_remove in self.__original_order:
-            self.__original_order.remove(track_to_remove)
+        self.__original_order.pop(track_to_remove, None)
         
         self.save_state()
         return True
@@ -323,7 +368,8 @@ class MusicQueue:
         self.__is_shuffled = False
         self.__is_repeat = False
         self.__is_playing = False
-        self.__original_order = []
+        self.__track_set = set()
+        self.__original_order = {}
         self.save_state()
     
     # Get current track
@@ -332,12 +378,19 @@ class MusicQueue:
     
     # Get total duration
     def get_total_duration(self):
-        total_seconds = 0
+        tracks = []
         current = self.__head
         while current:
-            total_seconds += current.track.duration_to_seconds()
+            tracks.append(current.track)
             current = current.next
         
+        library = self.__get_library() if tracks else None
+        if library:
+            # Summed over the library's seconds column
+            total_seconds = library.get_track_table().total_seconds_of(tracks)
+        else:
+            total_seconds = sum(track.duration_to_seconds() for track in tracks)
+        
         hours = total_seconds // 3600
         minutes = (total_seconds % 3600) // 60
         seconds = total_seconds % 60
@@ -456,84 +509,161 @@ class MusicQueue:
         print(f"\n<Page {page} of {total_pages}>")
         print()
     
-    # Save queue state
+    # Save queue state (debounced)
+    # Only takes a cheap snapshot of references here, the state is written
+    # after SAVE_DELAY seconds without another save_state call
     def save_state(self):
-        tracks_data = []
+        tracks = []
         current = self.__head
         current_index = -1
         idx = 0
         
         while current:
-            tracks_data.append(current.track.to_dict())
+            tracks.append(current.track)
             if current == self.__current:
                 current_index = idx
             current = current.next
             idx += 1
         
-        original_data = [t.to_dict() for t in self.__original_order]
+        snapshot = (tuple(tracks), current_index, self.__is_shuffled,
+                    self.__is_repeat, self.__is_playing, tuple(self.__original_order))
         
+        with self.__save_lock:
+            self.__pending_state = snapshot
+            # Restart idle window, bursts of changes merge into one write
+            self.__save_deadline = time.monotonic() + SAVE_DELAY
+            if self.__save_timer is None:
+                self.__start_timer(SAVE_DELAY)
+    
+    # Start timer that writes pending state (caller holds the save lock)
+    def __start_timer(self, delay):
+        self.__save_timer = threading.Timer(delay, self.__on_timer)
+        self.__save_timer.daemon = True
+        self.__save_timer.start()
+    
+    # Timer fired: write state, or wait again if the deadline moved
+    def __on_timer(self):
+        with self.__save_lock:
+            if self.__save_timer is None:
+                return  # Flushed meanwhile
+            remaining = self.__save_deadline - time.monotonic()
+            if remaining > 0:
+                self.__start_timer(remaining)
+                return
+        self.flush_state()
+    
+    # Write pending queue state now (if there is one)
+    # State stays pending if the write fails, so the next flush retries
+    def flush_state(self):
+        with self.__save_lock:
+            if self.__save_timer:
+                self.__save_timer.cancel()
+                self.__save_timer = None
+            snapshot = self.__pending_state
+            if snapshot is not None:
+                self.__write_state(snapshot)
+                self.__pending_state = None
+    
+    # Write state snapshot to store or JSON file (atomic replace)
+    def __write_state(self, snapshot):
+        tracks, current_index, is_shuffled, is_repeat, is_playing, original_order = snapshot
         state = {
-            "tracks": tracks_data,
+            "tracks": [track.to_ref() for track in tracks],
             "current_index": current_index,
-            "is_shuffled": self.__is_shuffled,
-            "is_repeat": self.__is_repeat,
-            "is_playing": self.__is_playing,
-            "original_order": original_data
+            "is_shuffled": is_shuffled,
+            "is_repeat": is_repeat,
+            "is_playing": is_playing,
+            "original_order": [track.to_ref() for track in original_order]
         }
         
-        os.makedirs(os.path.dirname(self.__file_path), exist_ok=True)
+        if self.__store:
+            self.__store.save_queue_state(state)
+        else:
+            atomic_write_json(self.__file_path, state)
+    
+    # Read saved state dict from store or JSON file, None if nothing saved
+    def __read_state(self):
+        if self.__store:
+            state = self.__store.load_queue_state()
+            if state is not None:
+                return state
+            # Nothing in database yet, fall back to JSON file
+        
+        if not os.path.exists(self.__file_path):
+            return None
         
-        with open(self.__file_path, 'w') as f:
-            json.dump(state, f, indent=4)
+        with open(self.__file_path, 'r') as f:
+            return json.load(f)
+    
+    # Get library, loading it first if it was given as a function
+    def __get_library(self):
+        if callable(self.__library):
+            self.__library = self.__library()
+        return self.__library
+    
+    # Get track for a saved reference (library track id or track dict)
+    # Store ids that are not library tracks are read from their row
+    def __resolve(self, ref):
+        library = self.__get_library()
+        if library:
+            track = library.resolve_track(ref)
+        else:
+            track = Track.from_dict(ref) if isinstance(ref, dict) else None
+        if track is None and self.__store and not isinstance(ref, dict):
+            row = self.__store.get_track(ref)
+            track = row[1] if row else None
+        return track
     
     # Load queue state
     def load_state(self):
-        if not os.path.exists(self.__file_path):
-            return False
-        
         try:
-            with open(self.__file_path, 'r') as f:
-                state = json.load(f)
-                
-                # Clear current queue
-                self.__head = None
-                self.__tail = None
-                self.__size = 0
-                
-                # Load tracks
-                for track_data in state["tracks"]:
-                    track = Track.from_dict(track_data)
-                    new_node = QueueNode(track)
-                    if self.__head is None:
-                        self.__head = new_node
-                        self.__tail = new_node
-                    else:
-                        self.__tail.next = new_node
-                        new_node.prev = self.__tail
-                        self.__tail = new_node
-                    self.__size += 1
-                
-                # Set current track
-                current_index = state["current_index"]
-                if current_index >= 0:
-                    current = self.__head
-                    for i in range(current_index):
-                        if current:
-                            current = current.next
-                    self.__current = current
-                
-                # Restore state
-                self.__is_shuffled = state["is_shuffled"]
-                self.__is_repeat = state["is_repeat"]
-                self.__is_playing = state["is_playing"]
-                
-                # Load original order
-                self.__original_order = []
-                for track_data in state["original_order"]:
-                    track = Track.from_dict(track_data)
-                    self.__original_order.append(track)
-                
-                return True
+            state = self.__read_state()
+            if state is None:
+                return False
+            
+            # Clear current queue
+            self.__head = None
+            self.__tail = None
+            self.__size = 0
+            self.__track_set = set()
+            
+            # Load tracks, the saved current index counts skipped ones too
+            current_index = state["current_index"]
+            self.__current = None
+            for index, ref in enumerate(state["tracks"]):
+                track = self.__resolve(ref)
+                if track is None:
+                    continue  # Track id no longer in library
+                self.__track_set.add(track)
+                new_node = QueueNode(track)
+                if self.__head is None:
+                    self.__head = new_node
+                    self.__tail = new_node
+                else:
+                    self.__tail.next = new_node
+                    new_node.prev = self.__tail
+                    self.__tail = new_node
+                self.__size += 1
+                if index == current_index:
+                    self.__current = new_node
+            
+            # Current track was dropped: start from the first track
+            if current_index >= 0 and self.__current is None:
+                self.__current = self.__head
+            
+            # Restore state
+            self.__is_shuffled = state["is_shuffled"]
+            self.__is_repeat = state["is_repeat"]
+            self.__is_playing = state["is_playing"]
+            
+            # Load original order
+            self.__original_order = {}
+            for ref in state["original_order"]:
+                track = self.__resolve(ref)
+                if track is not None:
+                    self.__original_order[track] = None
+            
+            return True
         except:
             return False
     
@@ -0,0 +1,456 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import Config
+from Track import Track
+
+# Tables and indexes for library, albums, playlists and queue
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,          -- JSON: string or list of artists
+    album TEXT NOT NULL,
+    duration TEXT NOT NULL,
+    title_key TEXT NOT NULL,       -- Track.get_sort_key() columns
+    artist_key TEXT NOT NULL,
+    album_key TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    in_library INTEGER NOT NULL DEFAULT 0
+);
+-- Same order as the library tree, also used to find a track's id
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tracks_sort
+    ON tracks (title_key, artist_key, album_key, seconds);
+-- Library rows only, so counting, paging and ranking library tracks
+-- never skip over tracks that are only in playlists or the queue
+CREATE INDEX IF NOT EXISTS idx_library_sort
+    ON tracks (title_key, artist_key, album_key, seconds) WHERE in_library = 1;
+
+CREATE TABLE IF NOT EXISTS albums (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS album_tracks (
+    album_id INTEGER NOT NULL REFERENCES albums (id),
+    position INTEGER NOT NULL,
+    track_id INTEGER NOT NULL REFERENCES tracks (id),
+    PRIMARY KEY (album_id, position),
+    UNIQUE (album_id, track_id)
+);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlist_entries (
+    playlist_id INTEGER NOT NULL REFERENCES playlists (id),
+    position INTEGER NOT NULL,
+    track_id INTEGER NOT NULL REFERENCES tracks (id),
+    added_at TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS queue_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    current_index INTEGER NOT NULL,
+    is_shuffled INTEGER NOT NULL,
+    is_repeat INTEGER NOT NULL,
+    is_playing INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue_entries (
+    list TEXT NOT NULL,            -- 'tracks' or 'original_order'
+    position INTEGER NOT NULL,
+    track_id INTEGER NOT NULL REFERENCES tracks (id),
+    PRIMARY KEY (list, position)
+);
+"""
+
+# Columns of a track row, in the order __track_from_row takes them
+TRACK_COLUMNS = "id, title, artist, album, duration"
+
+# Library tracks in library sort order (served by idx_library_sort)
+LIBRARY_ORDER = "ORDER BY title_key, artist_key, album_key, seconds"
+
+# Shared store (one connection for all managers), created on first use
+_shared_store = None
+
+
+# Get the configured SQLite store, or None when using JSON files
+def get_store():
+    global _shared_store
+    if Config.STORAGE_BACKEND != "sqlite":
+        return None
+    if _shared_store is None:
+        _shared_store = SQLiteStore(Config.SQLITE_PATH)
+    return _shared_store
+
+
+class SQLiteStore:
+    """
+    Storage backend keeping library, albums, playlists and queue in SQLite.
+
+    Every track is stored once in the tracks table. Albums, playlists and
+    the queue only keep track ids with their positions, so adding one
+    track or entry is a single indexed row insert instead of rewriting a
+    whole JSON file. Writes are committed right away unless a transaction
+    is open, then they are committed together when it ends.
+
+    Attributes:
+        __connection: Open sqlite3 connection
+        __transaction_depth: Number of open transactions
+        __lock: Held by every method and by open transactions, so the
+            queue's save timer thread and the main thread never run
+            statements or commits in between each other
+    """
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Queue state is written from a timer thread (debounced saves)
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+        self.__transaction_depth = 0
+        self.__lock = threading.RLock()
+
+    # Open transaction (writes committed when the outermost one ends)
+    # The lock is held until the matching commit, so a queue save from the
+    # timer thread never lands between the transaction's statements
+    def begin(self):
+        self.__lock.acquire()
+        self.__transaction_depth += 1
+
+    # Close transaction, commit if it was the outermost one
+    def commit(self):
+        try:
+            self.__transaction_depth -= 1
+            self.__save()
+        finally:
+            self.__lock.release()
+
+    # Group many writes into one commit
+    @contextmanager
+    def transaction(self):
+        self.begin()
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    # Commit now unless inside a transaction
+    def __save(self):
+        with self.__lock:
+            if self.__transaction_depth == 0:
+                self.__connection.commit()
+
+    # Close database connection
+    def close(self):
+        with self.__lock:
+            self.__connection.commit()
+            self.__connection.close()
+
+    # Get id of track row (insert it if missing)
+    # New rows get track_id when given and still free (ids moved over from
+    # JSON files stay valid), else the next free id
+    def __track_id(self, track, in_library=False, track_id=None):
+        key = track.get_sort_key()
+        row = self.__connection.execute(
+            "SELECT id, in_library FROM tracks "
+            "WHERE title_key = ? AND artist_key = ? AND album_key = ? AND seconds = ?",
+            key).fetchone()
+        if row:
+            if in_library and not row[1]:
+                self.__connection.execute(
+                    "UPDATE tracks SET in_library = 1 WHERE id = ?", (row[0],))
+            return row[0]
+
+        if track_id is not None and self.__connection.execute(
+                "SELECT 1 FROM tracks WHERE id = ?", (track_id,)).fetchone():
+            track_id = None  # Taken, NULL makes SQLite pick the next id
+        cursor = self.__connection.execute(
+            "INSERT INTO tracks (id, title, artist, album, duration, title_key, "
+            "artist_key, album_key, seconds, in_library) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (track_id, track.get_title(), json.dumps(track.get_artist()), track.get_album(),
+             track.get_duration()) + key + (1 if in_library else 0,))
+        return cursor.lastrowid
+
+    # Get track row id for a Track.to_ref reference (library track ids
+    # are row ids with this backend, dicts are looked up or inserted)
+    def __ref_id(self, ref):
+        if isinstance(ref, dict):
+            return self.__track_id(Track.from_dict(ref))
+        return ref
+
+    # Build (track id, Track) from TRACK_COLUMNS of a row
+    @staticmethod
+    def __track_from_row(track_id, title, artist, album, duration):
+        return track_id, Track(title, json.loads(artist), album, duration)
+
+    # Get number of tracks in library
+    def count_library_tracks(self):
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT COUNT(*) FROM tracks WHERE in_library = 1").fetchone()[0]
+
+    # Load library tracks in sort order as list of (track id, Track)
+    def load_library_tracks(self):
+        with self.__lock:
+            rows = self.__connection.execute(
+                f"SELECT {TRACK_COLUMNS} FROM tracks WHERE in_library = 1 {LIBRARY_ORDER}")
+            return [self.__track_from_row(*row) for row in rows]
+
+    # Get library tracks at sort positions start to stop (stop excluded)
+    # as list of (track id, Track)
+    def get_library_range(self, start, stop):
+        with self.__lock:
+            rows = self.__connection.execute(
+                f"SELECT {TRACK_COLUMNS} FROM tracks WHERE in_library = 1 {LIBRARY_ORDER} "
+                "LIMIT ? OFFSET ?", (max(stop - start, 0), start))
+            return [self.__track_from_row(*row) for row in rows]
+
+    # Count library tracks whose sort key is smaller than key
+    def count_library_tracks_before(self, key):
+        with self.__lock:
+            return self.__connection.execute(
+                "SELECT COUNT(*) FROM tracks WHERE in_library = 1 "
+                "AND (title_key, artist_key, album_key, seconds) < (?, ?, ?, ?)", key).fetchone()[0]
+
+    # Find library track by sort key as (track id, Track), or None
+    def find_library_track(self, key):
+        with self.__lock:
+            row = self.__connection.execute(
+                f"SELECT {TRACK_COLUMNS} FROM tracks WHERE in_library = 1 "
+                "AND title_key = ? AND artist_key = ? AND album_key = ? AND seconds = ?",
+                key).fetchone()
+            return self.__track_from_row(*row) if row else None
+
+    # Get track row by id as (track id, Track), or None
+    # in_library=True only finds library tracks
+    def get_track(self, track_id, in_library=False):
+        with self.__lock:
+            row = self.__connection.execute(
+                f"SELECT {TRACK_COLUMNS} FROM tracks WHERE id = ?"
+                + (" AND in_library = 1" if in_library else ""), (track_id,)).fetchone()
+            return self.__track_from_row(*row) if row else None
+
+    # Get view serving library reads from the tracks table
+    def get_library_view(self):
+        return LibraryView(self)
+
+    # Add track to library (single row insert), returns its row id
+    # track_id asks for that row id (see __track_id)
+    def add_library_track(self, track, track_id=None):
+        with self.__lock:
+            track_id = self.__track_id(track, in_library=True, track_id=track_id)
+            self.__save()
+            return track_id
+
+    # Append track to album (creates album row if needed)
+    def add_album_track(self, album_name, track):
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR IGNORE INTO albums (name) VALUES (?)", (album_name,))
+            album_id = self.__connection.execute(
+                "SELECT id FROM albums WHERE name = ?", (album_name,)).fetchone()[0]
+            track_id = self.__track_id(track)
+            position = self.__connection.execute(
+                "SELECT COUNT(*) FROM album_tracks WHERE album_id = ?", (album_id,)).fetchone()[0]
+            self.__connection.execute(
+                "INSERT OR IGNORE INTO album_tracks (album_id, position, track_id) VALUES (?, ?, ?)",
+                (album_id, position, track_id))
+            self.__save()
+
+    # Load albums in creation order as list of (name, [track ids])
+    def load_albums(self):
+        with self.__lock:
+            albums = []
+            rows = self.__connection.execute(
+                "SELECT albums.name, album_tracks.track_id FROM albums "
+                "JOIN album_tracks ON album_tracks.album_id = albums.id "
+                "ORDER BY albums.id, album_tracks.position")
+            for name, track_id in rows:
+                if not albums or albums[-1][0] != name:
+                    albums.append((name, []))
+                albums[-1][1].append(track_id)
+            return albums
+
+    # Get id of playlist by name
+    def __playlist_id(self, name):
+        row = self.__connection.execute(
+            "SELECT id FROM playlists WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    # Create playlist row
+    def add_playlist(self, name, created_at):
+        with self.__lock:
+            self.__connection.execute(
+                "INSERT OR IGNORE INTO playlists (name, created_at) VALUES (?, ?)",
+                (name, created_at.isoformat()))
+            self.__save()
+
+    # Append track to playlist (single row insert)
+    def add_playlist_entry(self, name, track, added_at):
+        with self.__lock:
+            playlist_id = self.__playlist_id(name)
+            track_id = self.__track_id(track)
+            position = self.__connection.execute(
+                "SELECT COUNT(*) FROM playlist_entries WHERE playlist_id = ?",
+                (playlist_id,)).fetchone()[0]
+            self.__connection.execute(
+                "INSERT INTO playlist_entries (playlist_id, position, track_id, added_at) "
+                "VALUES (?, ?, ?, ?)",
+                (playlist_id, position, track_id, added_at.isoformat()))
+            self.__save()
+
+    # Check if any playlist is stored
+    def has_playlists(self):
+        with self.__lock:
+            return self.__connection.execute("SELECT 1 FROM playlists LIMIT 1").fetchone() is not None
+
+    # Load playlists in the same dict format as playlists.json (entries
+    # hold track ids, resolved by the caller like ids from the JSON file)
+    def load_playlists(self):
+        with self.__lock:
+            playlists = []
+            by_id = {}
+            for playlist_id, name, created_at in self.__connection.execute(
+                    "SELECT id, name, created_at FROM playlists ORDER BY id"):
+                data = {"name": name, "created_at": created_at, "tracks": []}
+                by_id[playlist_id] = data
+                playlists.append(data)
+
+            rows = self.__connection.execute(
+                "SELECT playlist_id, added_at, track_id FROM playlist_entries "
+                "ORDER BY playlist_id, position")
+            for playlist_id, added_at, track_id in rows:
+                by_id[playlist_id]["tracks"].append({"track": track_id, "added_at": added_at})
+            return playlists
+
+    # Save queue state (same dict format as queue_state.json)
+    def save_queue_state(self, state):
+        with self.__lock:
+            self.__write_queue_state(state)
+
+    # Replace queue rows and flags (caller holds the lock)
+    def __write_queue_state(self, state):
+        self.__connection.execute("DELETE FROM queue_entries")
+        for list_name in ("tracks", "original_order"):
+            rows = []
+            for position, ref in enumerate(state[list_name]):
+                rows.append((list_name, position, self.__ref_id(ref)))
+            self.__connection.executemany(
+                "INSERT INTO queue_entries (list, position, track_id) VALUES (?, ?, ?)", rows)
+
+        self.__connection.execute(
+            "INSERT OR REPLACE INTO queue_state "
+            "(id, current_index, is_shuffled, is_repeat, is_playing) VALUES (1, ?, ?, ?, ?)",
+            (state["current_index"], int(state["is_shuffled"]),
+             int(state["is_repeat"]), int(state["is_playing"])))
+        self.__save()
+
+    # Load queue state (same dict format as queue_state.json, tracks as
+    # track ids), or None
+    def load_queue_state(self):
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT current_index, is_shuffled, is_repeat, is_playing "
+                "FROM queue_state WHERE id = 1").fetchone()
+            if row is None:
+                return None
+
+            state = {
+                "tracks": [],
+                "current_index": row[0],
+                "is_shuffled": bool(row[1]),
+                "is_repeat": bool(row[2]),
+                "is_playing": bool(row[3]),
+                "original_order": []
+            }
+            rows = self.__connection.execute(
+                "SELECT list, track_id FROM queue_entries ORDER BY list, position")
+            for list_name, track_id in rows:
+                state[list_name].append(track_id)
+            return state
+
+
+class LibraryView:
+    """
+    Sorted, read-mostly view of the library rows of a SQLiteStore.
+
+    Offers the same reads as BinarySnapshot.SnapshotReader, so Library
+    can serve counts, pages, positions and lookups from the tracks table
+    (idx_library_sort) without loading every track. Tracks are built
+    once per id and cached, so repeated reads return the same objects.
+    Library reports its own inserts with add() while the view is in use.
+
+    Attributes:
+        __store: SQLiteStore holding the rows
+        __count: Number of library tracks (None until first asked)
+        __tracks: Track id -> Track built from its row
+    """
+    def __init__(self, store):
+        self.__store = store
+        self.__count = None
+        self.__tracks = {}
+
+    # Get cached Track for (track id, Track) row, caching it if new
+    def __cached(self, row):
+        track_id, track = row
+        cached = self.__tracks.get(track_id)
+        if cached is None:
+            track.set_id(track_id)
+            cached = self.__tracks[track_id] = track
+        return cached
+
+    # Number of library tracks (counted once, then kept up to date by add)
+    def __len__(self):
+        if self.__count is None:
+            self.__count = self.__store.count_library_tracks()
+        return self.__count
+
+    # Get track at position (library sort order)
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        tracks = self.get_range(index, index + 1)
+        if not tracks:
+            raise IndexError("Library view index out of range")
+        return tracks[0]
+
+    # Get tracks at positions start to stop (stop excluded, clamped)
+    def get_range(self, start, stop):
+        start = max(start, 0)
+        return [self.__cached(row) for row in self.__store.get_library_range(start, stop)]
+
+    # Position of first track with sort key >= key
+    def lower_bound(self, key):
+        return self.__store.count_library_tracks_before(key)
+
+    # Get track with exactly this sort key, or None
+    def find_key(self, key):
+        row = self.__store.find_library_track(key)
+        return self.__cached(row) if row else None
+
+    # Get library track by id, or None
+    def find_id(self, track_id):
+        track = self.__tracks.get(track_id)
+        if track is None:
+            row = self.__store.get_track(track_id, in_library=True)
+            track = self.__cached(row) if row else None
+        return track
+
+    # Record a track Library just stored as library row (has its row id)
+    def add(self, track):
+        self.__tracks[track.get_id()] = track
+        if self.__count is not None:
+            self.__count += 1
+
+    # Iterate tracks in library sort order
+    def __iter__(self):
+        for row in self.__store.load_library_tracks():
+            yield self.__cached(row)
+
+    # Nothing to release (the store's connection stays open)
+    def close(self):
+        pass
@@ -0,0 +1,438 @@
+import re
+import threading
+from collections import deque
+from heapq import nsmallest
+
+# Query term: optional "field:" then "quoted phrase" or a single word
+QUERY_TERM_PATTERN = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+# Fields that can be searched, bare words search the title
+SEARCH_FIELDS = ("title", "artist", "album")
+
+# New BK-tree terms linked per lock hold by the background linker
+FUZZY_LINK_BATCH = 500
+
+
+# Split text into normalized word tokens
+def tokenize(text):
+    return re.findall(r"\w+", text.casefold())
+
+
+# Normalize name for matching: casefold and collapse whitespace
+def normalize_text(text):
+    return " ".join(text.casefold().split())
+
+
+# Parse query like: artist:"Ava Rivers" album:morning golden
+# Returns list of (field, text) pairs, bare words get field "title"
+def parse_query(query):
+    terms = []
+    for match in QUERY_TERM_PATTERN.finditer(query):
+        field, phrase, word = match.groups()
+        text = phrase if phrase is not None else word
+        if field is None:
+            field = "title"
+        elif field.casefold() in SEARCH_FIELDS:
+            field = field.casefold()
+        else:
+            # Unknown field, search the whole thing as title words
+            text = match.group(0)
+            field = "title"
+        if tokenize(text):
+            terms.append((field, text))
+    return terms
+
+
+class TrigramIndex:
+    """
+    Inverted index from title trigrams to tracks for substring search.
+
+    Every title is casefolded and split into all its 3-letter pieces
+    (trigrams). Each trigram keep a posting list (set of row ids) of the
+    titles that contain it. A substring query only has to intersect the
+    posting lists of its own trigrams and check the few candidates left,
+    instead of scanning every title in the library.
+
+    Attributes:
+        __tracks: Indexed tracks, position in list is the row id
+        __titles: Normalized title for each row id
+        __postings: Hash map: trigram -> set of row ids
+    """
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self.__tracks = []
+        self.__titles = []
+        self.__postings = {}
+
+    # Normalize text the same way for titles and queries
+    @staticmethod
+    def normalize(text):
+        return text.casefold()
+
+    # Get set of all trigrams in normalized text
+    def __grams(self, text):
+        size = self.GRAM_SIZE
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    # Add track to index - O(length of title)
+    def add(self, track):
+        row_id = len(self.__tracks)
+        title = self.normalize(track.get_title())
+        self.__tracks.append(track)
+        self.__titles.append(title)
+
+        for gram in self.__grams(title):
+            posting = self.__postings.get(gram)
+            if posting is None:
+                self.__postings[gram] = {row_id}
+            else:
+                posting.add(row_id)
+
+    # Get number of indexed tracks
+    def get_size(self):
+        return len(self.__tracks)
+
+    # Find tracks whose title contain search term (case-insensitive)
+    # Results come back in library sort order
+    def search(self, search_term):
+        term = self.normalize(search_term)
+
+        if len(term) < self.GRAM_SIZE:
+            # Too short for trigrams, check every title
+            candidates = range(len(self.__titles))
+        else:
+            # Intersect posting lists, smallest first to keep sets small
+            postings = []
+            for gram in self.__grams(term):
+                posting = self.__postings.get(gram)
+                if not posting:
+                    return []  # Some trigram never appears, no match possible
+                postings.append(posting)
+            postings.sort(key=len)
+
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    return []
+
+        # Verify candidates (trigrams can match out of order)
+        results = [self.__tracks[row_id] for row_id in candidates
+                   if term in self.__titles[row_id]]
+        results.sort(key=lambda track: track.get_sort_key())
+        return results
+
+
+class FieldIndex:
+    """
+    Inverted indexes on title, artist and album word tokens.
+
+    Each field has its own hash map from token to the set of row ids
+    that contain it. Every credited artist of a multi-artist track is
+    indexed. A query is answered by intersecting the posting lists of
+    all its tokens (smallest first) and then checking that quoted
+    phrases really appear in the field.
+
+    Attributes:
+        __tracks: Indexed tracks, position in list is the row id
+        __values: Normalized field values for each row id (for phrases)
+        __postings: Hash map: field -> (token -> set of row ids)
+    """
+    def __init__(self):
+        self.__tracks = []
+        self.__values = []
+        self.__postings = {field: {} for field in SEARCH_FIELDS}
+
+    # Add row id to posting list of every token in text
+    def __index_text(self, field, text, row_id):
+        postings = self.__postings[field]
+        for token in tokenize(text):
+            posting = postings.get(token)
+            if posting is None:
+                postings[token] = {row_id}
+            else:
+                posting.add(row_id)
+
+    # Add track to all field indexes
+    def add(self, track):
+        row_id = len(self.__tracks)
+        artists = track.get_artists()
+        self.__tracks.append(track)
+        self.__values.append({
+            "title": [self.__phrase_text(track.get_title())],
+            "artist": [self.__phrase_text(artist) for artist in artists],
+            "album": [self.__phrase_text(track.get_album())]
+        })
+
+        self.__index_text("title", track.get_title(), row_id)
+        for artist in artists:
+            self.__index_text("artist", artist, row_id)
+        self.__index_text("album", track.get_album(), row_id)
+
+    # Normalize text to " word word " so phrases only match whole words
+    @staticmethod
+    def __phrase_text(text):
+        return " " + " ".join(tokenize(text)) + " "
+
+    # Check quoted phrase appear in one of the row's field values
+    def __has_phrase(self, row_id, field, phrase):
+        words = self.__phrase_text(phrase)
+        for value in self.__values[row_id][field]:
+            if words in value:
+                return True
+        return False
+
+    # Find tracks matching all (field, text) terms
+    # Results come back in library sort order
+    def search(self, terms):
+        if not terms:
+            return []
+
+        postings = []
+        phrases = []
+        for field, text in terms:
+            tokens = tokenize(text)
+            for token in tokens:
+                posting = self.__postings[field].get(token)
+                if not posting:
+                    return []  # Some token never appears, no match possible
+                postings.append(posting)
+            if len(tokens) > 1:
+                phrases.append((field, text))
+
+        # Intersect smallest posting list first to keep sets small
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+
+        results = []
+        for row_id in candidates:
+            if all(self.__has_phrase(row_id, field, text) for field, text in phrases):
+                results.append(self.__tracks[row_id])
+        results.sort(key=lambda track: track.get_sort_key())
+        return results
+
+
+# Bit masks of where each character appear in pattern (for edit_distance)
+def char_masks(pattern):
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+# Levenshtein edit distance between pattern and text
+# Uses Myers' bit-parallel algorithm: one pass over text with a few integer
+# operations per character instead of filling a full DP table.
+# masks can be passed in to reuse char_masks(pattern) across many texts.
+def edit_distance(pattern, text, masks=None):
+    length = len(pattern)
+    if length == 0:
+        return len(text)
+    if masks is None:
+        masks = char_masks(pattern)
+
+    full = (1 << length) - 1
+    last_bit = 1 << (length - 1)
+    positive = full  # Vertical +1 deltas
+    negative = 0     # Vertical -1 deltas
+    score = length
+
+    for char in text:
+        equal = masks.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        h_positive = negative | ~(horizontal | positive)
+        h_negative = positive & horizontal
+        if h_positive & last_bit:
+            score += 1
+        elif h_negative & last_bit:
+            score -= 1
+        h_positive = (h_positive << 1) | 1
+        h_negative = h_negative << 1
+        positive = (h_negative | ~(vertical | h_positive)) & full
+        negative = (h_positive & vertical) & full
+    return score
+
+
+# BK-tree node for fuzzy search
+class BKNode:
+    """
+    Represent a node in BK-tree (tree over edit distance).
+
+    Each node store one vocabulary term and the rows that use it.
+    Children are keyed by their edit distance to this node's term.
+
+    Attributes:
+        term: Normalized vocabulary term
+        row_ids: Set of row ids whose title or artist contain the term
+        children: Hash map: edit distance -> child BKNode
+    """
+    def __init__(self, term, row_id):
+        self.term = term
+        self.row_ids = {row_id}
+        self.children = {}
+
+
+class FuzzyIndex:
+    """
+    Typo-tolerant search over title and artist vocabularies (BK-tree).
+
+    Every normalized title, artist name and the words inside them are
+    inserted once into a BK-tree. Searching with max distance d only
+    visit children whose edge distance is within d of the query's
+    distance to the node (triangle inequality), so most of the
+    vocabulary is skipped instead of comparing against every track.
+    New terms wait in a pending queue, so adding tracks never computes
+    edit distances. After a bulk load the owner calls link_in_background
+    and a thread links them in small batches while the program is idle;
+    a search links only the terms the thread has not reached yet.
+
+    Attributes:
+        __tracks: Indexed tracks, position in list is the row id
+        __root: Root BKNode of the tree
+        __terms: Hash map: term -> BKNode (for repeated terms)
+        __pending: New BKNodes not linked into the tree yet
+        __lock: Held while the tree is changed or searched
+        __linker: Background thread linking pending terms (None if idle)
+        __stopping: True when the linker should stop after its batch
+    """
+    def __init__(self):
+        self.__tracks = []
+        self.__root = None
+        self.__terms = {}
+        self.__pending = deque()
+        self.__lock = threading.Lock()
+        self.__linker = None
+        self.__stopping = False
+
+    # Default allowed typos for a query of this length
+    @staticmethod
+    def default_max_distance(term):
+        return max(1, min(3, len(term) // 4))
+
+    # Record that row use term (new terms wait in pending list)
+    def __add_term(self, term, row_id):
+        node = self.__terms.get(term)
+        if node:
+            node.row_ids.add(row_id)
+            return
+
+        new_node = BKNode(term, row_id)
+        self.__terms[term] = new_node
+        self.__pending.append(new_node)
+
+    # Link node into BK-tree (iterative)
+    def __link(self, new_node):
+        if self.__root is None:
+            self.__root = new_node
+            return
+
+        masks = char_masks(new_node.term)
+        node = self.__root
+        while True:
+            distance = edit_distance(new_node.term, node.term, masks)
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = new_node
+                return
+            node = child
+
+    # Link up to `limit` pending terms (all if None), caller holds the lock
+    def __link_pending(self, limit=None):
+        pending = self.__pending
+        while pending and limit != 0:
+            self.__link(pending.popleft())
+            if limit is not None:
+                limit -= 1
+
+    # Background thread: link pending terms batch by batch, releasing the
+    # lock in between so a search never waits for more than one batch
+    def __run_linker(self):
+        while self.__pending and not self.__stopping:
+            with self.__lock:
+                self.__link_pending(FUZZY_LINK_BATCH)
+
+    # Start linking pending terms on a background thread (no-op if nothing
+    # is pending or the thread is already running)
+    def link_in_background(self):
+        if not self.__pending:
+            return
+        if self.__linker is None or not self.__linker.is_alive():
+            self.__stopping = False
+            self.__linker = threading.Thread(target=self.__run_linker, daemon=True)
+            self.__linker.start()
+
+    # Wait until background linker has linked every pending term
+    def wait_idle(self):
+        if self.__linker is not None:
+            self.__linker.join()
+            self.__linker = None
+
+    # Stop background linker after its current batch (terms not linked
+    # yet stay pending, the next search links them)
+    def stop_linking(self):
+        self.__stopping = True
+        self.wait_idle()
+
+    # Add track title, artists and their words to the vocabulary
+    def add(self, track):
+        row_id = len(self.__tracks)
+        self.__tracks.append(track)
+
+        for text in [track.get_title()] + track.get_artists():
+            term = normalize_text(text)
+            if not term:
+                continue
+            self.__add_term(term, row_id)
+            words = term.split()
+            if len(words) > 1:
+                for word in words:
+                    self.__add_term(word, row_id)
+
+    # Find vocabulary terms within max_distance of term
+    # Returns list of (distance, BKNode)
+    def __find_terms(self, term, max_distance):
+        found = []
+        with self.__lock:
+            self.__link_pending()  # Terms the linker has not reached yet
+            if self.__root is None:
+                return found
+
+            masks = char_masks(term)
+            stack = [self.__root]
+            while stack:
+                node = stack.pop()
+                distance = edit_distance(term, node.term, masks)
+                if distance <= max_distance:
+                    found.append((distance, node))
+                low = distance - max_distance
+                high = distance + max_distance
+                for edge, child in node.children.items():
+                    if low <= edge <= high:
+                        stack.append(child)
+        return found
+
+    # Find top tracks whose title or artist is close to search term
+    # Ranked by edit distance, then library sort order
+    def search(self, search_term, limit=10, max_distance=None):
+        term = normalize_text(search_term)
+        if not term or limit <= 0:
+            return []
+        if max_distance is None:
+            max_distance = self.default_max_distance(term)
+
+        best = {}  # row id -> smallest distance
+        for distance, node in self.__find_terms(term, max_distance):
+            for row_id in node.row_ids:
+                if distance < best.get(row_id, max_distance + 1):
+                    best[row_id] = distance
+
+        # Only the best `limit` rows are ordered (top-k heap, not a full sort)
+        ranked = nsmallest(limit, best.items(),
+                           key=lambda item: (item[1], self.__tracks[item[0]].get_sort_key()))
+        return [self.__tracks[row_id] for row_id, distance in ranked]
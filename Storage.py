@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+
+# Write data as JSON atomically
+# Data goes to a temp file in the same directory first, then the temp file
+# is renamed over the target, so a crash never leave a half-written file
+def atomic_write_json(file_path, data, indent=4):
+    _atomic_write(file_path, lambda f: json.dump(data, f, indent=indent), 'w', ".json")
+
+
+# Write bytes atomically (same temp file + rename as atomic_write_json)
+def atomic_write_bytes(file_path, data):
+    _atomic_write(file_path, lambda f: f.write(data), 'wb', ".bin")
+
+
+# Call write(f) on a temp file, fsync it and rename it over file_path
+def _atomic_write(file_path, write, open_mode, suffix):
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    # Keep permissions of the file being replaced (temp files are 0600)
+    mode = os.stat(file_path).st_mode & 0o777 if os.path.exists(file_path) else 0o644
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=suffix)
+    try:
+        with os.fdopen(fd, open_mode) as f:
+            os.fchmod(f.fileno(), mode)
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        # Clean up temp file, keep old file untouched
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
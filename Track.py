@@ -1,48 +1,137 @@
 import json
+import sys
+
+# Parse "mm:ss" or "h:mm:ss" duration to seconds, None if invalid
+def parse_duration(duration):
+    try:
+        parts = [int(part) for part in duration.split(":")]
+    except (ValueError, AttributeError):
+        return None
+    if len(parts) not in (2, 3) or any(part < 0 for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
 
 class Track:
+    """
+    Immutable track value.
+    
+    Uses __slots__ (no per-instance __dict__) and interns the strings many
+    tracks share (artists, albums, durations), so a large library keeps
+    one copy of each. The duration is parsed to seconds once here instead
+    of on every total or sort. Only the library track id can be set after
+    construction; it is not part of the track's value.
+    
+    Attributes:
+        __title: Track title
+        __artist: Artist name, or tuple of names for multiple artists
+        __album: Album name
+        __duration: Duration as given ("mm:ss" or "h:mm:ss")
+        __seconds: Duration in seconds (0 if duration is invalid)
+        __id: Library track id, None until added to library
+        __sort_key: Comparison key (title, main artist, album, seconds)
+        __hash: Hash of identity key, computed once
+    """
+    __slots__ = ("__title", "__artist", "__album", "__duration",
+                 "__seconds", "__id", "__sort_key", "__hash")
+    
     def __init__(self, title, artist, album, duration):  
-        # Private attributes with data encapsulation 
-        self.__title = title
-        self.__artist = artist  # can be string or list for multiple artists
-        self.__album = album
-        self.__duration = duration  # format: "mm:ss"
+        # Multiple artists are kept as a tuple so the track stays immutable
+        if isinstance(artist, (list, tuple)):
+            artist = tuple(sys.intern(name) for name in artist)
+            main_artist = artist[0] if artist else ""
+        else:
+            artist = main_artist = sys.intern(artist)
+        seconds = parse_duration(duration)
+        
+        init = object.__setattr__
+        init(self, "_Track__title", title)
+        init(self, "_Track__artist", artist)
+        init(self, "_Track__album", sys.intern(album))
+        init(self, "_Track__duration", sys.intern(duration))
+        init(self, "_Track__seconds", seconds or 0)  # Invalid format counts as 0
+        init(self, "_Track__id", None)
+        # Comparison key computed once: (title, main artist, album, seconds)
+        # Text fields are casefolded so sorting is case-insensitive
+        init(self, "_Track__sort_key", (
+            title.casefold(),
+            sys.intern(main_artist.casefold()),
+            sys.intern(album.casefold()),
+            seconds or 0
+        ))
+        init(self, "_Track__hash", hash(self.get_key()))
+    
+    # Tracks can not be changed after construction
+    def __setattr__(self, name, value):
+        raise AttributeError("Track is immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Track is immutable")
+    
+    # Pickle/copy through the constructor (keeps the library track id)
+    def __reduce__(self):
+        return (Track, (self.__title, self.get_artist(), self.__album, self.__duration),
+                self.__id)
+    
+    def __setstate__(self, track_id):
+        self.set_id(track_id)
     
     # Getters for encapsulation
     def get_title(self):
         return self.__title
     
+    # Get artist name, or list of names for multiple artists
     def get_artist(self):
+        if isinstance(self.__artist, tuple):
+            return list(self.__artist)
         return self.__artist
     
+    # Get list of credited artist names (one name for a single artist)
+    def get_artists(self):
+        if isinstance(self.__artist, tuple):
+            return list(self.__artist)
+        return [self.__artist]
+    
     def get_album(self):
         return self.__album
     
     def get_duration(self):
         return self.__duration
+    
+    # Get library track id (None if track is not in library)
+    def get_id(self):
+        return self.__id
+    
+    # Set library track id (done by Library)
+    def set_id(self, track_id):
+        object.__setattr__(self, "_Track__id", track_id)
+    
+    # Get identity key (title, artist, album, duration): tracks are equal
+    # when their keys are equal. Multiple artists are a tuple in the key,
+    # so the same artists in the same order give the same key
+    def get_key(self):
+        return (self.__title, self.__artist, self.__album, self.__duration)
+    
+    # Get cached comparison key (title, main artist, album, seconds)
+    def get_sort_key(self):
+        return self.__sort_key
  
-    # Convert duration to seconds for calculations
+    # Get duration in seconds (parsed once at construction)
     def duration_to_seconds(self):
-        try:
-            parts = self.__duration.split(":")
-            if len(parts) != 2:
-                return 0  # Invalid format, return 0
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        except (ValueError, IndexError):
-            return 0  # Handle invalid duration format
+        return self.__seconds
         
     # Get main artist (for sorting when multiple artists)
     def get_main_artist(self):
-        if isinstance(self.__artist, list):
-            return self.__artist[0]
+        if isinstance(self.__artist, tuple):
+            return self.__artist[0] if self.__artist else ""
         return self.__artist
     
     # Display format
     def display(self):
         artist_str = self.__artist
-        if isinstance(self.__artist, list):
+        if isinstance(self.__artist, tuple):
             artist_str = ", ".join(self.__artist)
         return f"{self.__title} - {artist_str} ({self.__duration})"
     
@@ -50,11 +139,18 @@ class Track:
     def to_dict(self):
         return {
             "title": self.__title,
-            "artist": self.__artist,
+            "artist": self.get_artist(),
             "album": self.__album,
             "duration": self.__duration
         }
     
+    # Reference saved in albums, playlists and queue files: the library
+    # track id, or the full dict for a track that is not in the library
+    def to_ref(self):
+        if self.__id is not None:
+            return self.__id
+        return self.to_dict()
+    
     # For loading from JSON
     @staticmethod
     def from_dict(data):
@@ -64,10 +160,11 @@ class Track:
     def __eq__(self, other):
         if not isinstance(other, Track):
             return False
-        return (self.__title == other.__title and 
-                str(self.__artist) == str(other.__artist) and
-                self.__album == other.__album and
-                self.__duration == other.__duration)
+        return self.__hash == other.__hash and self.get_key() == other.get_key()
+    
+    # Hash matching __eq__, so tracks can be set members and dict keys
+    def __hash__(self):
+        return self.__hash
     
     # String representation
     def __str__(self):
@@ -0,0 +1,159 @@
+from array import array
+from SearchIndex import normalize_text
+
+
+class TrackTable:
+    """
+    Column store of library tracks for whole-catalog aggregates.
+
+    Each track gets a row number. Its duration in seconds and the ids of
+    its title, main artist and album strings are kept in parallel
+    array columns (4 bytes per value, no per-track objects). Artists are
+    stored as normalize_text keys, so spellings ArtistRegistry treats as
+    one artist are also counted as one (shown with the first spelling
+    seen). Totals,
+    histograms and group-by-album/artist run over a column (all rows) or
+    over a row selection, an array of row numbers (see select), without
+    touching Track objects.
+
+    Rows are added by Library when a track is registered, or on first
+    lookup for tracks still only in the binary snapshot. Tracks without a
+    library id have no row.
+
+    Attributes:
+        __seconds: Duration in seconds per row
+        __title_ids: Title string id per row
+        __artist_ids: Main artist string id per row
+        __album_ids: Album string id per row
+        __credits: Row -> tuple of artist string ids, only for rows with
+            several artists
+        __rows: Track -> row
+        __strings: Interned strings by id
+        __string_ids: String -> id
+        __artist_names: Artist key string id -> display name
+    """
+    def __init__(self):
+        self.__seconds = array('I')
+        self.__title_ids = array('I')
+        self.__artist_ids = array('I')
+        self.__album_ids = array('I')
+        self.__credits = {}
+        self.__rows = {}
+        self.__strings = []
+        self.__string_ids = {}
+        self.__artist_names = {}
+
+    # Number of rows
+    def __len__(self):
+        return len(self.__seconds)
+
+    # Get id of string, adding it to the string table if new
+    def __intern(self, text):
+        string_id = self.__string_ids.get(text)
+        if string_id is None:
+            string_id = self.__string_ids[text] = len(self.__strings)
+            self.__strings.append(text)
+        return string_id
+
+    # Get string by id
+    def get_string(self, string_id):
+        return self.__strings[string_id]
+
+    # Get string id of artist's normalized name, remember first spelling
+    def __intern_artist(self, name):
+        artist_id = self.__intern(normalize_text(name))
+        if artist_id not in self.__artist_names:
+            self.__artist_names[artist_id] = " ".join(name.split())
+        return artist_id
+
+    # Get row of track, adding the track if it has a library id but no row
+    # yet. Returns None for tracks that are not in the library
+    def row_for(self, track):
+        if track.get_id() is None:
+            return None
+        row = self.__rows.get(track)
+        if row is not None:
+            return row
+
+        row = self.__rows[track] = len(self.__seconds)
+        # Each artist once, in credit order (as ArtistRegistry)
+        artist_ids = tuple(dict.fromkeys(self.__intern_artist(name)
+                                         for name in track.get_artists()))
+        self.__seconds.append(track.duration_to_seconds())
+        self.__title_ids.append(self.__intern(track.get_title()))
+        self.__artist_ids.append(artist_ids[0] if artist_ids else self.__intern_artist(""))
+        self.__album_ids.append(self.__intern(track.get_album()))
+        if len(artist_ids) > 1:
+            self.__credits[row] = artist_ids
+        return row
+
+    # Get row selection (array of rows) for tracks, tracks without a row
+    # are left out
+    def select(self, tracks):
+        rows = array('I')
+        for track in tracks:
+            row = self.row_for(track)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    # Sum of seconds over rows (all rows if rows is None)
+    def total_seconds(self, rows=None):
+        if rows is None:
+            return sum(self.__seconds)
+        return sum(map(self.__seconds.__getitem__, rows))
+
+    # Sum of seconds of tracks, read from the column for tracks with a row
+    def total_seconds_of(self, tracks):
+        rows = array('I')
+        other_seconds = 0
+        for track in tracks:
+            row = self.row_for(track)
+            if row is None:
+                other_seconds += track.duration_to_seconds()
+            else:
+                rows.append(row)
+        return self.total_seconds(rows) + other_seconds
+
+    # Count durations per bucket: bucket start in seconds -> count
+    def duration_histogram(self, bucket_seconds=60, rows=None):
+        seconds = self.__seconds if rows is None else map(self.__seconds.__getitem__, rows)
+        histogram = {}
+        for value in seconds:
+            bucket = value - value % bucket_seconds
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        return dict(sorted(histogram.items()))
+
+    # Track count and total seconds per album: name -> (count, seconds)
+    def totals_by_album(self, rows=None):
+        return self.__group_totals(self.__album_ids, rows)
+
+    # Track count and total seconds per artist: name -> (count, seconds)
+    # Every credited artist of a multi-artist track gets the track
+    def totals_by_artist(self, rows=None):
+        totals = self.__group_totals(self.__artist_ids, rows, self.__artist_names)
+        if self.__credits:
+            selected = None if rows is None else set(rows)
+            for row, artist_ids in self.__credits.items():
+                if selected is not None and row not in selected:
+                    continue
+                for string_id in artist_ids[1:]:  # Main artist already counted
+                    name = self.__artist_names[string_id]
+                    count, seconds = totals.get(name, (0, 0))
+                    totals[name] = (count + 1, seconds + self.__seconds[row])
+        return totals
+
+    # Count and sum seconds per string id of key column
+    # names maps string ids to the names used as keys (default: the string)
+    def __group_totals(self, key_column, rows, names=None):
+        counts = {}
+        sums = {}
+        if rows is None:
+            pairs = zip(key_column, self.__seconds)
+        else:
+            pairs = zip(map(key_column.__getitem__, rows), map(self.__seconds.__getitem__, rows))
+        for key, seconds in pairs:
+            counts[key] = counts.get(key, 0) + 1
+            sums[key] = sums.get(key, 0) + seconds
+        names = names or self.__strings
+        return {names[key]: (counts[key], sums[key]) for key in counts}
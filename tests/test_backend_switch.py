@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Run script in a fresh interpreter inside workdir (managers use relative
+# data/ paths and Config reads the backend at import), return its stdout
+def run(workdir, script, storage, snapshot="json"):
+    env = dict(os.environ, PYTHONPATH=REPO, LTTM_STORAGE=storage, LTTM_SNAPSHOT=snapshot)
+    return subprocess.run([sys.executable, "-c", textwrap.dedent(script)], cwd=workdir,
+                          env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+
+
+# Switching from JSON files to sqlite keeps what playlists, the queue and
+# albums point at, including tracks only in the library log
+def test_json_to_sqlite_keeps_references(tmp_path):
+    run(tmp_path, """
+        from Library import Library
+        from Playlist import PlaylistManager
+        from Queue import MusicQueue
+        from Track import Track
+
+        library = Library()
+        # Ids follow insertion order, not sort order
+        with library.transaction():
+            for title in ("Zeta", "Beta", "Alpha"):
+                library.add_track(Track(title, "Artist", "Saved", "3:00"))
+        library.add_track(Track("Gamma", "Artist", "Logged", "3:00"))  # Log only
+
+        playlists = PlaylistManager(library)
+        playlists.create_playlist("Mix")
+        playlists.add_track_to_playlist("Mix", library.search_by_title("Alpha")[0])
+
+        queue = MusicQueue(library)
+        queue.load_tracks(library.search_by_title("Beta"))
+        queue.play()
+        queue.flush_state()
+        library.close()
+    """, "json")
+
+    check = """
+        from Library import Library
+        from Playlist import PlaylistManager
+        from Queue import MusicQueue
+
+        library = Library()
+        mix = PlaylistManager(library).get_playlist("Mix")
+        print([track.get_title() for track in mix.get_tracks()])
+        queue = MusicQueue(library)
+        queue.load_state()
+        print(queue.get_current_track().get_title())
+        albums = library.get_album_manager()
+        for name in ("Saved", "Logged"):
+            print(name, sorted(track.get_title() for track in albums.get_album(name).get_tracks()))
+        library.close()
+    """
+    expected = ["['Alpha']", "Beta", "Saved ['Alpha', 'Beta', 'Zeta']", "Logged ['Gamma']"]
+    assert run(tmp_path, check, "sqlite").splitlines() == expected  # Migration run
+    assert run(tmp_path, check, "sqlite").splitlines() == expected  # Loaded from store
+
+
+# Tracks added while the binary snapshot format was used are still there
+# after switching back to library.json, or on to sqlite
+def test_binary_snapshot_tracks_survive_format_switch(tmp_path):
+    def add(title, snapshot):
+        run(tmp_path, f"""
+            from Library import Library
+            from Track import Track
+
+            library = Library()
+            with library.transaction():
+                library.add_track(Track("{title}", "Artist", "Album", "3:00"))
+            library.close()
+        """, "json", snapshot)
+
+    titles = """
+        from Library import Library
+
+        library = Library()
+        print([track.get_title() for track in library.get_all_tracks()])
+        library.close()
+    """
+    add("First", "json")
+    add("Second", "binary")
+    assert run(tmp_path, titles, "json") == "['First', 'Second']\n"
+    add("Third", "binary")
+    assert run(tmp_path, titles, "sqlite") == "['First', 'Second', 'Third']\n"
@@ -0,0 +1,78 @@
+import os
+
+from ImportManifest import ImportManifest
+
+ROWS = "title,artist,album,duration\nOne,A,X,3:00\nTwo,B,Y,4:00\n"
+
+
+# Write file and give it a distinct modification time
+def write(path, text, mtime):
+    path.write_text(text)
+    os.utime(path, ns=(mtime, mtime))
+
+
+# Check file and record it as imported, like the import does
+def import_file(manifest, path):
+    result = manifest.check(str(path))
+    if result is not None:
+        manifest.record(str(path), result[2])
+    return result
+
+
+# New file is read whole, unchanged file is skipped (also after reload)
+def test_new_then_unchanged(tmp_path):
+    path = tmp_path / "tracks.csv"
+    write(path, ROWS, 10 ** 18)
+    manifest = ImportManifest(str(tmp_path / "manifest.json"))
+    offset, first_line, entry = import_file(manifest, path)
+    assert (offset, first_line) == (0, 1)
+    assert entry["size"] == len(ROWS) and entry["lines"] == 3
+    assert manifest.check(str(path)) is None
+
+    manifest.save()
+    assert ImportManifest(str(tmp_path / "manifest.json")).check(str(path)) is None
+
+
+# Touched file (new mtime, same bytes) is unchanged
+def test_touched_file_is_unchanged(tmp_path):
+    path = tmp_path / "tracks.json"
+    write(path, '[{"title": "One"}]', 10 ** 18)
+    manifest = ImportManifest(str(tmp_path / "manifest.json"))
+    import_file(manifest, path)
+    os.utime(path, ns=(2 * 10 ** 18, 2 * 10 ** 18))
+    assert manifest.check(str(path)) is None
+    assert manifest.check(str(path)) is None  # New mtime was recorded
+
+
+# Rows appended to a CSV are read from the old end of file
+def test_appended_csv_reads_only_new_rows(tmp_path):
+    path = tmp_path / "tracks.csv"
+    write(path, ROWS, 10 ** 18)
+    manifest = ImportManifest(str(tmp_path / "manifest.json"))
+    import_file(manifest, path)
+    write(path, ROWS + "Three,C,Z,5:00\n", 2 * 10 ** 18)
+    offset, first_line, entry = import_file(manifest, path)
+    assert (offset, first_line) == (len(ROWS), 4)
+    assert entry["lines"] == 4
+    with open(path, "rb") as f:
+        f.seek(offset)
+        assert f.read() == b"Three,C,Z,5:00\n"
+
+
+# Edited files are read whole: changed CSV rows, a CSV whose last row was
+# cut off before the append, and any change to a non-CSV file
+def test_edited_files_are_read_whole(tmp_path):
+    manifest = ImportManifest(str(tmp_path / "manifest.json"))
+    cases = [
+        ("edited.csv", ROWS, ROWS.replace("Two", "Tow") + "Three,C,Z,5:00\n"),
+        ("torn.csv", ROWS + "Thr", ROWS + "Three,C,Z,5:00\n"),
+        ("grown.json", '[{"title": "One"}]', '[{"title": "One"}, {"title": "Two"}]'),
+    ]
+    for name, old, new in cases:
+        path = tmp_path / name
+        write(path, old, 10 ** 18)
+        import_file(manifest, path)
+        write(path, new, 2 * 10 ** 18)
+        offset, first_line, entry = import_file(manifest, path)
+        assert (offset, first_line) == (0, 1), name
+        assert entry["size"] == len(new)
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from Importer import iter_json_array
+
+DOCUMENTS = [
+    '[]',
+    '  [ ]  ',
+    '[1, 12, -3.5e2, 0.25, true, false, null]',
+    '[{"title": "Héllo \\"quoted\\"", "artist": ["A", "B"], "duration": "3:05"}]',
+    '[\n  {"a": [1, [2, {"b": "c]"}]]},\n  "x,y",\n  12345678901234567890\n]\n',
+    '\ufeff["bom"]',
+]
+
+MALFORMED = [
+    '',
+    '{"title": "not an array"}',
+    '[1, 2',
+    '[1, 2,',
+    '[1 2]',
+    '[1, 2] 3',
+    '[{"title": "unterminated]',
+    '[{"title": 1,}]',
+    '[1,, 2]',
+]
+
+
+# Elements match json.loads for every read size, also when a chunk ends
+# inside a string, number or escape sequence
+@pytest.mark.parametrize("text", DOCUMENTS)
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 64 * 1024])
+def test_matches_json_loads(tmp_path, text, read_size):
+    path = tmp_path / "tracks.json"
+    path.write_text(text, encoding="utf-8")
+    assert list(iter_json_array(str(path), read_size)) == json.loads(text.lstrip("\ufeff"))
+
+
+# Malformed files raise ValueError (as json.load would), never stop quietly
+@pytest.mark.parametrize("text", MALFORMED)
+@pytest.mark.parametrize("read_size", [1, 3, 64 * 1024])
+def test_malformed_input_raises(tmp_path, text, read_size):
+    path = tmp_path / "tracks.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError, match="at character"):
+        list(iter_json_array(str(path), read_size))
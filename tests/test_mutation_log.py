@@ -0,0 +1,45 @@
+import json
+
+from MutationLog import MutationLog
+
+
+# Torn last line (crash mid-append) is dropped and cut off, so records
+# appended after restart are not glued to the half-written one
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = str(tmp_path / "library.log")
+    log = MutationLog(path)
+    log.append({"op": "add", "id": 1})
+    log.append({"op": "add", "id": 2})
+    log.close()
+    with open(path, "a") as f:
+        f.write('{"op":"add","id":')
+
+    log = MutationLog(path)
+    assert [record["id"] for record in log.replay()] == [1, 2]
+    assert log.get_count() == 2
+    log.append({"op": "add", "id": 3})
+    log.close()
+
+    with open(path) as f:
+        assert [json.loads(line)["id"] for line in f] == [1, 2, 3]
+    assert [record["id"] for record in MutationLog(path).replay()] == [1, 2, 3]
+
+
+# Compaction interrupted before the snapshot was written: the ".old" log
+# is replayed before the current one and kept by the next compaction
+def test_interrupted_compaction_is_replayed(tmp_path):
+    path = str(tmp_path / "library.log")
+    log = MutationLog(path)
+    log.append({"op": "add", "id": 1})
+    log.begin_compaction()
+    log.append({"op": "add", "id": 2})
+    log.close()  # Crash: finish_compaction never ran
+
+    log = MutationLog(path)
+    assert [record["id"] for record in log.replay()] == [1, 2]
+
+    log.begin_compaction()
+    assert [record["id"] for record in MutationLog(path).replay()] == [1, 2]
+    log.finish_compaction()
+    assert list(MutationLog(path).replay()) == []
+    assert not (tmp_path / "library.log.old").exists()
@@ -0,0 +1,37 @@
+import random
+
+from BinarySnapshot import SnapshotOverlay, SnapshotReader, write_snapshot
+from Track import Track
+
+
+# Overlay reads match one sorted list of snapshot and added tracks
+def test_overlay_matches_sorted_list(tmp_path):
+    rng = random.Random(1)
+    tracks = {}
+    while len(tracks) < 600:
+        track = Track(f"Title {rng.randrange(10 ** 6):07d}", "Artist", "Album", "3:00")
+        tracks[track.get_sort_key()] = track
+    tracks = list(tracks.values())
+    for track_id, track in enumerate(tracks, 1):
+        track.set_id(track_id)
+
+    saved = sorted(tracks[:500], key=Track.get_sort_key)
+    write_snapshot(str(tmp_path / "library.bin"), saved)
+    overlay = SnapshotOverlay(SnapshotReader(str(tmp_path / "library.bin")))
+    expected = list(saved)
+    for track in tracks[500:]:
+        overlay.add(track)
+        expected.append(track)
+    expected.sort(key=Track.get_sort_key)
+
+    assert len(overlay) == len(expected)
+    assert [track.get_id() for track in overlay] == [track.get_id() for track in expected]
+    assert [track.get_id() for track in overlay.get_range(95, 130)] == \
+        [track.get_id() for track in expected[95:130]]
+    for position, track in enumerate(expected):
+        key = track.get_sort_key()
+        assert overlay[position].get_id() == track.get_id()
+        assert overlay.lower_bound(key) == position
+        assert overlay.find_key(key).get_id() == track.get_id()
+        assert overlay.find_id(track.get_id()).get_id() == track.get_id()
+    overlay.close()